@@ -1,14 +1,21 @@
 import sys
 from PyQt5.QtWidgets import QApplication, QMainWindow, QFileDialog, QDialog
 from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import pyqtSignal, QThread
 from ui.main_window import Ui_MainWindow
 from ui.advanced_options import Ui_AdvancedOptions
-from data_types import AdvancedOptions, PianoKey
+from data_types import AdvancedOptions, PianoKey, PatchReduction, DecodeBackend
 from app_logging import logger, LogLevel
+from qt_logging import LogEmitter
+from transcription_worker import TranscriptionWorker
+from frame_cache import FrameCache
+from frame_loader import FrameLoader
+import os
 import cv2
 import vision
 
+maxLogLines = 5000
+
 
 class AdvancedOptionsWindow(QDialog, Ui_AdvancedOptions):
     advancedOptions = pyqtSignal(AdvancedOptions)
@@ -23,6 +30,30 @@ class AdvancedOptionsWindow(QDialog, Ui_AdvancedOptions):
         self.keyDifferenceThresholdSpinBox.setValue(
             advancedOptions.keyDifferenceThreshold
         )
+        self.numWorkersSpinBox.setValue(advancedOptions.numWorkers)
+        self.useKeyCacheCheckBox.setChecked(advancedOptions.useKeyCache)
+        self.profileRunCheckBox.setChecked(advancedOptions.profileRun)
+        self.autoCalibrateCheckBox.setChecked(advancedOptions.autoCalibrate)
+        self.patchWidthSpinBox.setValue(advancedOptions.patchWidth)
+        self.patchHeightSpinBox.setValue(advancedOptions.patchHeight)
+        for reduction in PatchReduction:
+            self.patchReductionComboBox.addItem(reduction.name, reduction.value)
+        self.patchReductionComboBox.setCurrentIndex(
+            self.patchReductionComboBox.findText(advancedOptions.patchReduction.name)
+        )
+        self.samplerThreadsSpinBox.setValue(advancedOptions.samplerThreads)
+        self.colorProfileLineEdit.setText(advancedOptions.colorProfile)
+        self.colorComponentsSpinBox.setValue(advancedOptions.colorComponents)
+        self.skipStaticFramesCheckBox.setChecked(advancedOptions.skipStaticFrames)
+        self.staticFrameToleranceSpinBox.setValue(advancedOptions.staticFrameTolerance)
+        self.autoTrimCheckBox.setChecked(advancedOptions.autoTrim)
+        self.writeTimingsCheckBox.setChecked(advancedOptions.writeTimings)
+        self.streamTranscriptionCheckBox.setChecked(advancedOptions.streamTranscription)
+        for backend in DecodeBackend:
+            self.decodeBackendComboBox.addItem(backend.name, backend.value)
+        self.decodeBackendComboBox.setCurrentIndex(
+            self.decodeBackendComboBox.findText(advancedOptions.decodeBackend.name)
+        )
         for key in PianoKey:
             self.startingKeyNoteComboBox.addItem(key.name, key.value)
             if key == advancedOptions.startingKey:
@@ -38,6 +69,22 @@ class AdvancedOptionsWindow(QDialog, Ui_AdvancedOptions):
             keyOffset=self.keyOffsetSpinBox.value(),
             keyDifferenceThreshold=self.keyDifferenceThresholdSpinBox.value(),
             startingKey=PianoKey(self.startingKeyNoteComboBox.currentData()),
+            numWorkers=self.numWorkersSpinBox.value(),
+            useKeyCache=self.useKeyCacheCheckBox.isChecked(),
+            profileRun=self.profileRunCheckBox.isChecked(),
+            autoCalibrate=self.autoCalibrateCheckBox.isChecked(),
+            patchWidth=self.patchWidthSpinBox.value(),
+            patchHeight=self.patchHeightSpinBox.value(),
+            patchReduction=PatchReduction(self.patchReductionComboBox.currentData()),
+            decodeBackend=DecodeBackend(self.decodeBackendComboBox.currentData()),
+            samplerThreads=self.samplerThreadsSpinBox.value(),
+            colorProfile=self.colorProfileLineEdit.text().strip(),
+            colorComponents=self.colorComponentsSpinBox.value(),
+            skipStaticFrames=self.skipStaticFramesCheckBox.isChecked(),
+            staticFrameTolerance=self.staticFrameToleranceSpinBox.value(),
+            autoTrim=self.autoTrimCheckBox.isChecked(),
+            writeTimings=self.writeTimingsCheckBox.isChecked(),
+            streamTranscription=self.streamTranscriptionCheckBox.isChecked(),
         )
         self.advancedOptions.emit(updatedOptions)
         self.accept()
@@ -48,21 +95,38 @@ class App(QMainWindow, Ui_MainWindow):
         super().__init__()
         self.setupUi(self)
 
-        self.videoCapture: cv2.VideoCapture
         self.baseFrame: cv2.typing.MatLike
         self.previewedFrame: cv2.typing.MatLike
+        self.videoPath = ""
+        self.keyLocations: list[tuple[int, int]] = []
+        self.keysPreviewed = False
+
+        # ----- Frame scrubbing -----
+        self.frameCache: FrameCache | None = None
+        self.frameLoaderThread: QThread | None = None
+        self.frameLoader: FrameLoader | None = None
+
+        # ----- Transcription -----
+        self.transcriptionThread: QThread | None = None
+        self.transcriptionWorker: TranscriptionWorker | None = None
 
         # ----- Advanced Options -----
         self.advancedOptionsWindow: QDialog
         self.advancedOptions = AdvancedOptions()
 
         # ----- Creating UI connections ------
-        logger.logSignal.connect(self.log)
+        self.logOutput.setMaximumBlockCount(maxLogLines)
+        self.logEmitter = LogEmitter(self)
+        self.logEmitter.logSignal.connect(self.log)
+        logger.addSink(self.logEmitter.sendMessage)
 
         # ----- Connecting UI to functions ------
         self.fileBrowseButton.clicked.connect(self.browseFiles)
         self.advancedOptionsButton.clicked.connect(self.openAdvancedOptions)
-        self.previewKeysButton.clicked.connect(self.previewKeyDetection)
+        self.frameSlider.valueChanged.connect(self.scrubToFrame)
+        self.previewKeysButton.clicked.connect(self.calibrateAndPreviewKeys)
+        self.transcribeVideoButton.clicked.connect(self.startTranscription)
+        self.cancelTranscriptionButton.clicked.connect(self.cancelTranscription)
 
     def browseFiles(self):
         dlg = QFileDialog()
@@ -75,23 +139,74 @@ class App(QMainWindow, Ui_MainWindow):
             self.openFile(selectedFile)
 
     def openFile(self, fileName):
-        self.videoCapture = cv2.VideoCapture(fileName)
-        fps = round(self.videoCapture.get(cv2.CAP_PROP_FPS), 0)
-        numFrames = self.videoCapture.get(cv2.CAP_PROP_FRAME_COUNT)
-        self.getFrame()
-        self.displayCurrentFrame()
-        self.previewKeysButton.setEnabled(True)
+        self.stopFrameLoader()
+        self.videoPath = fileName
+        self.keysPreviewed = False
+        self.frameCache = FrameCache(fileName)
+        fps = round(self.frameCache.fps, 0)
+        numFrames = self.frameCache.numFrames
+
+        # Decoding runs on a worker thread so scrubbing never blocks the window
+        self.frameLoaderThread = QThread(self)
+        self.frameLoader = FrameLoader(self.frameCache)
+        self.frameLoader.moveToThread(self.frameLoaderThread)
+        self.frameLoaderThread.started.connect(self.frameLoader.run)
+        self.frameLoader.frameReady.connect(self.frameLoaded)
+        self.frameLoaderThread.start()
+
+        self.frameSlider.blockSignals(True)
+        self.frameSlider.setRange(0, max(numFrames - 1, 0))
+        self.frameSlider.setValue(0)
+        self.frameSlider.blockSignals(False)
+        self.frameSlider.setEnabled(numFrames > 1)
+        self.scrubToFrame(0)
 
         logger.sendLog(f"Opened video file: {fileName}.", LogLevel.INFO)
         logger.sendLog(f"Frames per second: {fps}.", LogLevel.INFO)
+        logger.sendLog(f"Number of frames: {numFrames}.", LogLevel.INFO)
 
-    def getFrame(self):
-        if not self.videoCapture:
+    def stopFrameLoader(self):
+        if self.frameLoaderThread is None:
             return
+        self.frameLoader.stop()
+        self.frameLoaderThread.quit()
+        self.frameLoaderThread.wait()
+        self.frameLoader.deleteLater()
+        self.frameLoaderThread.deleteLater()
+        self.frameLoader = None
+        self.frameLoaderThread = None
+        self.frameCache = None
 
-        ret, frame = self.videoCapture.read()
+    def scrubToFrame(self, frameIndex: int):
+        self.frameLabel.setText(f"Frame {frameIndex} / {self.frameCache.numFrames}")
+        # Show the cached preview right away, the full frame follows from the loader
+        preview = self.frameCache.get(frameIndex)
+        if preview is not None:
+            self.previewedFrame = preview.copy()
+            if self.keysPreviewed:
+                scale = self.frameCache.previewScale
+                for x, y in self.keyLocations:
+                    cv2.circle(
+                        self.previewedFrame,
+                        (round(x * scale), round(y * scale)),
+                        1,
+                        (0, 255, 0),
+                        -1,
+                    )
+            self.displayCurrentFrame()
+        self.frameLoader.request(frameIndex)
+
+    def frameLoaded(self, frameIndex: int, frame: cv2.typing.MatLike):
+        # Ignore frames the user has already scrubbed past
+        if frameIndex != self.frameSlider.value():
+            return
         self.baseFrame = frame
+        self.previewKeysButton.setEnabled(True)
+        if self.keysPreviewed:
+            self.previewKeyDetection()
+            return
         self.previewedFrame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.displayCurrentFrame()
 
     def displayCurrentFrame(self):
         if self.previewedFrame is None:
@@ -132,7 +247,38 @@ class App(QMainWindow, Ui_MainWindow):
                 f"Starting Key changed to {updatedOptions.startingKey.name}.",
                 LogLevel.INFO,
             )
+        if self.advancedOptions.numWorkers != updatedOptions.numWorkers:
+            logger.sendLog(
+                f"Scanning Worker Processes changed to {updatedOptions.numWorkers}.",
+                LogLevel.INFO,
+            )
+        if self.advancedOptions.useKeyCache != updatedOptions.useKeyCache:
+            logger.sendLog(
+                f"Key sample cache {'enabled' if updatedOptions.useKeyCache else 'disabled'}.",
+                LogLevel.INFO,
+            )
+        if self.advancedOptions.profileRun != updatedOptions.profileRun:
+            logger.sendLog(
+                f"Transcription profiling {'enabled' if updatedOptions.profileRun else 'disabled'}.",
+                LogLevel.INFO,
+            )
         self.advancedOptions = updatedOptions
+        if self.keysPreviewed:
+            self.previewKeyDetection()
+
+    def calibrateAndPreviewKeys(self):
+        if self.advancedOptions.autoCalibrate:
+            calibration = vision.calibrateKeyDetection([self.baseFrame])
+            if calibration is None:
+                logger.sendLog(
+                    "Auto-calibration could not find a keyboard, using the manual key detection settings.",
+                    LogLevel.WARN,
+                )
+            else:
+                self.advancedOptions = vision.applyCalibration(
+                    self.advancedOptions, calibration
+                )
+        self.previewKeyDetection()
 
     def previewKeyDetection(self):
         self.previewedFrame = self.baseFrame.copy()
@@ -140,6 +286,8 @@ class App(QMainWindow, Ui_MainWindow):
         keyLocations = vision.determineKeyLocations(
             self.baseFrame, self.advancedOptions
         )
+        self.keyLocations = keyLocations
+        self.keysPreviewed = True
         for x, y in keyLocations:
             cv2.circle(self.previewedFrame, (x, y), 1, (0, 255, 0), -1)
         self.displayCurrentFrame()
@@ -154,9 +302,92 @@ class App(QMainWindow, Ui_MainWindow):
         ):
             logger.sendLog(
                 f"Detected fewer than {fullPianoKeyLocations} keys. Consider adjusting detection parameters or starting key / note.",
-                LogLevel.WARNING,
+                LogLevel.WARN,
             )
 
+    def startTranscription(self):
+        if self.transcriptionThread is not None:
+            return
+        defaultOutput = os.path.splitext(self.videoPath)[0] + ".mid"
+        outputPath, _ = QFileDialog.getSaveFileName(
+            self, "Save Transcription", defaultOutput, "MIDI Files (*.mid)"
+        )
+        if not outputPath:
+            return
+
+        # Run the pipeline off the GUI thread so the window stays responsive
+        self.transcriptionThread = QThread(self)
+        self.transcriptionWorker = TranscriptionWorker(
+            self.videoPath, self.keyLocations, self.advancedOptions, outputPath
+        )
+        self.transcriptionWorker.moveToThread(self.transcriptionThread)
+        self.transcriptionThread.started.connect(self.transcriptionWorker.run)
+        self.transcriptionWorker.progress.connect(self.updateTranscriptionProgress)
+        self.transcriptionWorker.finished.connect(self.transcriptionFinished)
+        self.transcriptionWorker.failed.connect(self.transcriptionFailed)
+        self.transcriptionWorker.cancelled.connect(self.transcriptionCancelled)
+        self.transcriptionThread.finished.connect(self.cleanUpTranscription)
+
+        self.transcribeVideoButton.setEnabled(False)
+        self.cancelTranscriptionButton.setEnabled(True)
+        self.transcriptionProgressBar.setValue(0)
+        self.transcriptionProgressBar.setFormat("Starting…")
+        logger.sendLog(f"Transcribing to {outputPath}.", LogLevel.INFO)
+        self.transcriptionThread.start()
+
+    def cancelTranscription(self):
+        if self.transcriptionWorker is None:
+            return
+        self.transcriptionWorker.cancel()
+        self.cancelTranscriptionButton.setEnabled(False)
+        self.transcriptionProgressBar.setFormat("Cancelling…")
+
+    def updateTranscriptionProgress(
+        self,
+        framesDone: int,
+        totalFrames: int,
+        framesPerSecond: float,
+        remainingSeconds: float,
+    ):
+        self.transcriptionProgressBar.setMaximum(max(totalFrames, 1))
+        self.transcriptionProgressBar.setValue(min(framesDone, totalFrames))
+        self.transcriptionProgressBar.setFormat(
+            f"%p% - {framesPerSecond:.0f} frames/s - ETA {remainingSeconds:.0f}s"
+        )
+
+    def transcriptionFinished(self, hands: list):
+        self.transcriptionProgressBar.setValue(self.transcriptionProgressBar.maximum())
+        self.transcriptionProgressBar.setFormat("Done")
+        logger.sendLog("Transcription finished.", LogLevel.INFO)
+        self.transcriptionThread.quit()
+
+    def transcriptionFailed(self, error: str):
+        self.transcriptionProgressBar.setFormat("Failed")
+        logger.sendLog(f"Transcription failed: {error}", LogLevel.ERROR)
+        self.transcriptionThread.quit()
+
+    def transcriptionCancelled(self):
+        self.transcriptionProgressBar.setFormat("Cancelled")
+        logger.sendLog("Transcription cancelled.", LogLevel.INFO)
+        self.transcriptionThread.quit()
+
+    def cleanUpTranscription(self):
+        self.transcriptionWorker.deleteLater()
+        self.transcriptionThread.deleteLater()
+        self.transcriptionWorker = None
+        self.transcriptionThread = None
+        self.transcribeVideoButton.setEnabled(True)
+        self.cancelTranscriptionButton.setEnabled(False)
+
+    def closeEvent(self, event):
+        # Stop a running transcription before the window and its thread go away
+        if self.transcriptionThread is not None:
+            self.transcriptionWorker.cancel()
+            self.transcriptionThread.quit()
+            self.transcriptionThread.wait()
+        self.stopFrameLoader()
+        super().closeEvent(event)
+
     def log(self, message: str):
         self.logOutput.appendPlainText(message)
 
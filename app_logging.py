@@ -1,6 +1,10 @@
-from PyQt5.QtCore import QObject, pyqtSignal
+import sys
+import threading
+import time
 from enum import Enum
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable, Hashable
 
 
 class LogLevel(Enum):
@@ -10,18 +14,86 @@ class LogLevel(Enum):
     ERROR = 3
 
 
-class LogEmitter(QObject):
-    logSignal = pyqtSignal(str)
+@dataclass
+class RateLimitState:
+    logLevel: LogLevel
+    lastMessage: str
+    lastSent: float
+    suppressed: int = 0
 
-    def __init__(self, logLevel: LogLevel, parent=None):
-        super().__init__(parent)
+
+class Logger:
+    def __init__(self, logLevel: LogLevel, rateLimitSeconds: float = 1.0):
         self.logLevel = logLevel
+        # Each sink receives every formatted message, e.g. a Qt signal or stderr
+        self.sinks: list[Callable[[str], None]] = []
+        # Repeats of a message key within this window are counted, not sent
+        self.rateLimitSeconds = rateLimitSeconds
+        self.rateLimits: dict[Hashable, RateLimitState] = {}
+        self.rateLimitLock = threading.Lock()
+
+    def addSink(self, sink: Callable[[str], None]):
+        self.sinks.append(sink)
 
-    def sendLog(self, message: str, logLevel: LogLevel):
+    def removeSink(self, sink: Callable[[str], None]):
+        self.sinks.remove(sink)
+
+    def sendLog(self, message: str, logLevel: LogLevel, key: Hashable | None = None):
+        # Messages whose text varies per call (frame numbers etc.) can pass a
+        # shared key so they are rate limited together
         if logLevel.value < self.logLevel.value:
             return
+        if key is None:
+            key = (logLevel, message)
+        now = time.monotonic()
+        with self.rateLimitLock:
+            state = self.rateLimits.get(key)
+            if state is not None and now - state.lastSent < self.rateLimitSeconds:
+                state.suppressed += 1
+                state.lastMessage = message
+                return
+            suppressed = state.suppressed if state is not None else 0
+            self.rateLimits[key] = RateLimitState(logLevel, message, now)
+            if len(self.rateLimits) > 1024:
+                self.pruneRateLimits(now)
+        if suppressed:
+            message = f"{message} (repeated {suppressed} more times)"
+        self.emit(message, logLevel)
+
+    def flushSuppressed(self, force: bool = False):
+        # Reports counts for messages whose repeats were held back, once their
+        # window has passed (or immediately when forced, e.g. at the end of a run)
+        now = time.monotonic()
+        pending = []
+        with self.rateLimitLock:
+            for state in self.rateLimits.values():
+                if state.suppressed and (
+                    force or now - state.lastSent >= self.rateLimitSeconds
+                ):
+                    pending.append(
+                        (state.lastMessage, state.logLevel, state.suppressed)
+                    )
+                    state.suppressed = 0
+                    state.lastSent = now
+        for message, logLevel, suppressed in pending:
+            self.emit(f"{message} (repeated {suppressed} more times)", logLevel)
+
+    def pruneRateLimits(self, now: float):
+        self.rateLimits = {
+            key: state
+            for key, state in self.rateLimits.items()
+            if state.suppressed or now - state.lastSent < self.rateLimitSeconds
+        }
+
+    def emit(self, message: str, logLevel: LogLevel):
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.logSignal.emit(f"[{timestamp}] {logLevel.name} | {message}")
+        formattedMessage = f"[{timestamp}] {logLevel.name} | {message}"
+        for sink in self.sinks:
+            sink(formattedMessage)
+
+
+def stderrSink(message: str):
+    print(message, file=sys.stderr, flush=True)
 
 
-logger = LogEmitter(logLevel=LogLevel.INFO)
+logger = Logger(logLevel=LogLevel.INFO)
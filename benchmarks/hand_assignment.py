@@ -0,0 +1,61 @@
+# Times left/right hand assignment against the pandas loop it replaced.
+# Run from the project root: python -m benchmarks.hand_assignment
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_types import PianoKey
+from vision import assignHandLabels
+
+
+def assignHandLabelsPandas(labelMatrix: np.ndarray, keys: list[PianoKey]):
+    # The previous implementation, kept here as the comparison baseline
+    labeledDf = pd.DataFrame(labelMatrix, columns=[key.name for key in keys])
+    uniqueLabels, counts = np.unique(labelMatrix, return_counts=True)
+    labelFrequencyMap = dict(zip(uniqueLabels, counts))
+    byFrequency = sorted(labelFrequencyMap, key=labelFrequencyMap.get, reverse=True)
+    averageLabelLocation = {}
+    for label in byFrequency[2:]:
+        for key in keys:
+            mask = (labeledDf[key.name] == label).astype(int)
+            averageLabelLocation[label] = (
+                mask.sum(axis=0) * key.value
+            ) + averageLabelLocation.get(label, 0)
+        averageLabelLocation[label] = (
+            averageLabelLocation[label] / labelFrequencyMap[label]
+        )
+    labeledDf.replace({label: "X" for label in byFrequency})
+    return averageLabelLocation
+
+
+def timeCall(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=36000)
+    args = parser.parse_args()
+
+    keys = list(PianoKey)
+    rng = np.random.default_rng(0)
+    labelMatrix = rng.choice(4, (args.frames, len(keys)), p=[0.6, 0.3, 0.05, 0.05])
+
+    pandasTime = timeCall(assignHandLabelsPandas, labelMatrix, keys)
+    # HSV means of white keys, black keys and two hand colors
+    componentColors = np.array(
+        [[0, 0, 245], [0, 0, 20], [60, 170, 200], [105, 210, 230]], dtype=float
+    )
+    numpyTime = timeCall(assignHandLabels, labelMatrix, 4, keys, componentColors)
+    print(f"{args.frames} frames x {len(keys)} keys")
+    print(f"  pandas loop: {pandasTime * 1000:8.1f} ms")
+    print(f"  bincount:    {numpyTime * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Compares peak RSS of the old DataFrame key store against the KeySamples array.
+# Run from the project root: python -m benchmarks.key_store_memory
+
+import argparse
+import resource
+import subprocess
+import sys
+
+import numpy as np
+
+
+def makeFrame(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def buildDataFrameStore(numFrames: int, numKeys: int, width: int, height: int):
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    xs = np.linspace(0, width - 1, numKeys).astype(int)
+    y = height // 2
+    data = []
+    for _ in range(numFrames):
+        frame = makeFrame(rng, width, height)
+        data.append({f"key{i}": frame[y][x] for i, x in enumerate(xs)})
+    df = pd.DataFrame(data)
+    # The clustering stage then had to recover a numeric array
+    return np.vstack(df.values.flatten()).astype(float)
+
+
+def buildArrayStore(numFrames: int, numKeys: int, width: int, height: int):
+    rng = np.random.default_rng(0)
+    xs = np.linspace(0, width - 1, numKeys).astype(int)
+    y = height // 2
+    samples = np.empty((numFrames, numKeys, 3), dtype=np.uint8)
+    for i in range(numFrames):
+        frame = makeFrame(rng, width, height)
+        samples[i] = frame[y, xs]
+    return samples.reshape(-1, 3)
+
+
+def peakRssMb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def runSingle(store: str, numFrames: int, numKeys: int, width: int, height: int):
+    baseline = peakRssMb()
+    builder = buildDataFrameStore if store == "dataframe" else buildArrayStore
+    builder(numFrames, numKeys, width, height)
+    print(f"{peakRssMb() - baseline:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--keys", type=int, default=88)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--store", choices=["dataframe", "array"])
+    args = parser.parse_args()
+
+    if args.store:
+        runSingle(args.store, args.frames, args.keys, args.width, args.height)
+        return
+
+    for store in ("dataframe", "array"):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.key_store_memory",
+                "--store",
+                store,
+                "--frames",
+                str(args.frames),
+                "--keys",
+                str(args.keys),
+                "--width",
+                str(args.width),
+                "--height",
+                str(args.height),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        print(f"{store:>10}: peak RSS growth {result.stdout.strip()} MB")
+
+
+if __name__ == "__main__":
+    main()
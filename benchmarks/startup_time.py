@@ -0,0 +1,57 @@
+# Measures cold start latency of `import vision` and of launching the GUI.
+# Run from the project root: python -m benchmarks.startup_time
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+importVisionCode = "import vision"
+launchGuiCode = """
+import sys
+from PyQt5.QtWidgets import QApplication
+import app
+qApp = QApplication(sys.argv)
+window = app.App()
+window.show()
+qApp.processEvents()
+"""
+
+
+def timeSubprocess(code: str, env: dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code], env=env, check=True, capture_output=True
+    )
+    return time.perf_counter() - start
+
+
+def measure(name: str, code: str, repeats: int, env: dict[str, str]):
+    # The first run warms the OS file cache and is not counted
+    timeSubprocess(code, env)
+    timings = [timeSubprocess(code, env) for _ in range(repeats)]
+    print(
+        f"{name:>14}: median {statistics.median(timings) * 1000:7.1f} ms, "
+        f"min {min(timings) * 1000:7.1f} ms over {repeats} runs"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--skip-gui", action="store_true", help="Only measure `import vision`."
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    measure("import vision", importVisionCode, args.repeats, env)
+    if not args.skip_gui:
+        measure("GUI launch", launchGuiCode, args.repeats, env)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# Throughput, memory and accuracy benchmarks on synthetic Synthesia videos.
+# Run from the project root: python -m benchmarks.suite [--update-baselines]
+# Results are compared against benchmarks/baselines.json and regressions make
+# the run exit with status 1.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import cv2
+import numpy as np
+
+from data_types import AdvancedOptions, DecodeBackend, KeySamples, Notation
+from benchmarks.synthetic_video import renderSyntheticVideo
+from frame_sources import openFrameSource
+import vision
+
+minimumSecondsDifference = 0.005
+baselinesPath = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baselines.json"
+)
+
+
+def measure(call: Callable[[], object]) -> tuple[object, float, float]:
+    # Returns the result, wall seconds and peak traced memory in MB. Timing and
+    # memory use separate runs because tracemalloc slows allocation-heavy code.
+    start = time.perf_counter()
+    result = call()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024**2
+
+
+def readKeysFromPath(
+    videoPath: str, keyLocations: list[tuple[int, int]], options: AdvancedOptions
+) -> tuple[KeySamples, int]:
+    # Returns the samples and the number of decoded bytes the backend delivered
+    with openFrameSource(
+        videoPath, options.decodeBackend, vision.keyBandRect(keyLocations, options)
+    ) as video:
+        keySamples = vision.readKeys(video, keyLocations, options)
+        return keySamples, video.bytesRead
+
+
+def readFrame(videoPath: str, frameIndex: int = 0) -> np.ndarray:
+    video = cv2.VideoCapture(videoPath)
+    video.set(cv2.CAP_PROP_POS_FRAMES, frameIndex)
+    _, frame = video.read()
+    video.release()
+    return frame
+
+
+def labelAccuracy(predicted: np.ndarray, groundTruth: np.ndarray) -> dict:
+    numFrames = min(len(predicted), len(groundTruth))
+    predicted, groundTruth = predicted[:numFrames], groundTruth[:numFrames]
+    pressedCodes = [
+        code for code, notation in enumerate(Notation) if notation != Notation.Unpressed
+    ]
+    truePressed = np.isin(groundTruth, pressedCodes)
+    predictedPressed = np.isin(predicted, pressedCodes)
+    truePositives = (truePressed & predictedPressed & (predicted == groundTruth)).sum()
+    precision = truePositives / max(predictedPressed.sum(), 1)
+    recall = truePositives / max(truePressed.sum(), 1)
+    return {
+        "frameKeyAccuracy": float((predicted == groundTruth).mean()),
+        "pressedF1": float(2 * precision * recall / max(precision + recall, 1e-9)),
+    }
+
+
+def runSuite(videoPath: str, groundTruth: np.ndarray, repeats: int) -> dict:
+    options = AdvancedOptions(useKeyCache=False)
+    numFrames = len(groundTruth)
+    results = {}
+
+    # Import the clustering stack up front so it is not timed as part of a stage
+    from sklearn.mixture import GaussianMixture  # noqa: F401
+
+    frame = readFrame(videoPath)
+
+    def detectKeys():
+        return vision.determineKeyLocations(frame, options)
+
+    keyLocations, elapsed, peak = measure(detectKeys)
+    timings = [elapsed] + [measure(detectKeys)[1] for _ in range(repeats - 1)]
+    results["determineKeyLocations"] = {
+        "seconds": min(timings),
+        "peakMemoryMb": peak,
+        "detectedKeys": len(keyLocations),
+    }
+
+    (keySamples, bytesRead), elapsed, peak = measure(
+        lambda: readKeysFromPath(videoPath, keyLocations, options)
+    )
+    results["readKeys"] = {
+        "seconds": elapsed,
+        "framesPerSecond": numFrames / elapsed,
+        "peakMemoryMb": peak,
+        "decodedMbPerFrame": bytesRead / numFrames / 1024**2,
+    }
+
+    if shutil.which("ffmpeg"):
+        ffmpegOptions = AdvancedOptions(
+            useKeyCache=False, decodeBackend=DecodeBackend.Ffmpeg
+        )
+        (ffmpegSamples, bytesRead), elapsed, peak = measure(
+            lambda: readKeysFromPath(videoPath, keyLocations, ffmpegOptions)
+        )
+        results["readKeysFfmpeg"] = {
+            "seconds": elapsed,
+            "framesPerSecond": numFrames / elapsed,
+            "peakMemoryMb": peak,
+            "decodedMbPerFrame": bytesRead / numFrames / 1024**2,
+            "maxSampleDifference": int(
+                np.abs(
+                    ffmpegSamples.frameSamples.astype(np.int16)
+                    - keySamples.frameSamples.astype(np.int16)
+                ).max()
+            ),
+        }
+
+    keyLabels, elapsed, peak = measure(
+        lambda: vision.determineKeyPressesGMM(keySamples)
+    )
+    results["determineKeyPressesGMM"] = {
+        "seconds": elapsed,
+        "framesPerSecond": numFrames / elapsed,
+        "peakMemoryMb": peak,
+        **labelAccuracy(keyLabels.labels, groundTruth),
+    }
+
+    with tempfile.TemporaryDirectory() as outputDir:
+        _, elapsed, peak = measure(
+            lambda: vision.transcribeVideo(
+                videoPath,
+                keyLocations,
+                options,
+                os.path.join(outputDir, "benchmark.mid"),
+            )
+        )
+    results["endToEnd"] = {
+        "seconds": elapsed,
+        "framesPerSecond": numFrames / elapsed,
+        "peakMemoryMb": peak,
+    }
+    return results
+
+
+def findRegressions(
+    results: dict, baselines: dict, timeTolerance: float, accuracyTolerance: float
+) -> list[str]:
+    regressions = []
+    for stage, metrics in results.items():
+        baseline = baselines.get(stage, {})
+        for metric, value in metrics.items():
+            if metric not in baseline:
+                continue
+            expected = baseline[metric]
+            if metric == "seconds":
+                # Ignore sub-millisecond stages, which are dominated by timer noise
+                failed = (
+                    value > expected * (1 + timeTolerance)
+                    and value - expected > minimumSecondsDifference
+                )
+            elif metric == "peakMemoryMb":
+                failed = value > expected * (1 + timeTolerance)
+            elif metric in ("frameKeyAccuracy", "pressedF1"):
+                failed = value < expected - accuracyTolerance
+            elif metric == "detectedKeys":
+                failed = value != expected
+            else:
+                continue
+            if failed:
+                regressions.append(
+                    f"{stage}.{metric}: {value:.4g} (baseline {expected:.4g})"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed relative slowdown or memory growth before flagging.",
+    )
+    parser.add_argument("--accuracy-tolerance", type=float, default=0.02)
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    configName = f"{args.width}x{args.height}@{args.fps:g}fps_{args.seconds:g}s"
+    with tempfile.TemporaryDirectory() as videoDir:
+        videoPath = os.path.join(videoDir, "synthetic.mp4")
+        groundTruth = renderSyntheticVideo(
+            videoPath, args.width, args.height, args.fps, args.seconds
+        )
+        results = runSuite(videoPath, groundTruth, args.repeats)
+
+    print(json.dumps({configName: results}, indent=2))
+    if args.json:
+        with open(args.json, "w") as jsonFile:
+            json.dump({configName: results}, jsonFile, indent=2)
+
+    allBaselines = {}
+    if os.path.exists(baselinesPath):
+        with open(baselinesPath) as baselinesFile:
+            allBaselines = json.load(baselinesFile)
+    if args.update_baselines:
+        allBaselines[configName] = results
+        with open(baselinesPath, "w") as baselinesFile:
+            json.dump(allBaselines, baselinesFile, indent=2)
+            baselinesFile.write("\n")
+        print(f"Updated baselines for {configName}.")
+        return 0
+    if configName not in allBaselines:
+        print(f"No baselines stored for {configName}.")
+        return 0
+
+    regressions = findRegressions(
+        results,
+        allBaselines[configName],
+        args.time_tolerance,
+        args.accuracy_tolerance,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
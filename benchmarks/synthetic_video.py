@@ -0,0 +1,189 @@
+# Renders deterministic Synthesia-style videos with known key presses.
+# Run from the project root: python -m benchmarks.synthetic_video out.mp4
+
+import argparse
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from data_types import Notation, PianoKey
+
+numWhiteKeys = 52
+# Note names of the white keys in order, starting from A0
+whiteKeyNames = "ABCDEFG"
+# White keys that have a black key directly to their right
+whiteKeysWithSharp = set("ACDFG")
+
+backgroundColor = (40, 30, 30)
+whiteKeyColor = (245, 245, 245)
+blackKeyColor = (20, 20, 20)
+keySeparatorColor = (90, 90, 90)
+# BGR colors of the two hands, used for both falling notes and pressed keys
+handColors = {
+    Notation.LeftHand: (70, 200, 80),
+    Notation.RightHand: (230, 130, 40),
+}
+# Key index ranges each hand plays in
+handKeyRanges = {
+    Notation.LeftHand: (12, 43),
+    Notation.RightHand: (44, 79),
+}
+handCodes = {notation: code for code, notation in enumerate(Notation)}
+
+
+@dataclass
+class SyntheticNote:
+    keyIndex: int
+    hand: Notation
+    startFrame: int
+    endFrame: int
+
+
+@dataclass
+class KeyGeometry:
+    left: np.ndarray
+    right: np.ndarray
+    isBlack: np.ndarray
+
+
+def keyboardGeometry(width: int) -> KeyGeometry:
+    whiteWidth = width / numWhiteKeys
+    left, right, isBlack = [], [], []
+    for whiteIndex in range(numWhiteKeys):
+        left.append(whiteIndex * whiteWidth)
+        right.append((whiteIndex + 1) * whiteWidth)
+        isBlack.append(False)
+        name = whiteKeyNames[whiteIndex % len(whiteKeyNames)]
+        if name in whiteKeysWithSharp and whiteIndex < numWhiteKeys - 1:
+            center = (whiteIndex + 1) * whiteWidth
+            left.append(center - whiteWidth * 0.3)
+            right.append(center + whiteWidth * 0.3)
+            isBlack.append(True)
+    return KeyGeometry(np.array(left), np.array(right), np.array(isBlack))
+
+
+def generateNotes(
+    numFrames: int, fps: float, rng: np.random.Generator, introSeconds: float
+) -> list[SyntheticNote]:
+    notes = []
+    for hand, (lowKey, highKey) in handKeyRanges.items():
+        frame = int(introSeconds * fps)
+        while frame < numFrames:
+            duration = int(rng.uniform(0.15, 0.8) * fps)
+            chordSize = rng.integers(1, 4)
+            keys = rng.choice(np.arange(lowKey, highKey + 1), chordSize, replace=False)
+            for keyIndex in keys:
+                notes.append(
+                    SyntheticNote(
+                        int(keyIndex),
+                        hand,
+                        frame,
+                        min(frame + duration, numFrames),
+                    )
+                )
+            # Leave a gap so repeated keys are released between notes
+            frame += duration + int(rng.uniform(0.05, 0.4) * fps)
+    return notes
+
+
+def drawFrame(
+    frameIndex: int,
+    width: int,
+    height: int,
+    geometry: KeyGeometry,
+    notes: list[SyntheticNote],
+    fallSpeed: float,
+    pressedColors: dict[int, tuple[int, int, int]],
+) -> np.ndarray:
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = backgroundColor
+    keyboardTop = int(height * 0.75)
+    blackKeyBottom = keyboardTop + int((height - keyboardTop) * 0.6)
+
+    # Falling notes above the keyboard
+    for note in notes:
+        top = keyboardTop - (note.endFrame - frameIndex) * fallSpeed
+        bottom = keyboardTop - (note.startFrame - frameIndex) * fallSpeed
+        if bottom < 0 or top > keyboardTop:
+            continue
+        x0 = int(geometry.left[note.keyIndex]) + 1
+        x1 = int(geometry.right[note.keyIndex]) - 1
+        cv2.rectangle(
+            frame,
+            (x0, int(max(top, 0))),
+            (x1, int(min(bottom, keyboardTop - 1))),
+            handColors[note.hand],
+            -1,
+        )
+
+    # White keys first, then black keys on top
+    for keyIndex in np.flatnonzero(~geometry.isBlack):
+        x0, x1 = int(geometry.left[keyIndex]), int(geometry.right[keyIndex])
+        color = pressedColors.get(keyIndex, whiteKeyColor)
+        frame[keyboardTop:, x0:x1] = color
+        frame[keyboardTop:, x0 : x0 + 2] = keySeparatorColor
+    for keyIndex in np.flatnonzero(geometry.isBlack):
+        x0, x1 = int(geometry.left[keyIndex]), int(geometry.right[keyIndex])
+        color = pressedColors.get(keyIndex, blackKeyColor)
+        frame[keyboardTop:blackKeyBottom, x0:x1] = color
+    return frame
+
+
+def renderSyntheticVideo(
+    path: str,
+    width: int = 1280,
+    height: int = 720,
+    fps: float = 30,
+    seconds: float = 10,
+    seed: int = 0,
+    introSeconds: float = 1,
+) -> np.ndarray:
+    # Returns the ground truth label codes, shape (frames, 88), in list(Notation) order
+    rng = np.random.default_rng(seed)
+    numFrames = int(seconds * fps)
+    geometry = keyboardGeometry(width)
+    notes = generateNotes(numFrames, fps, rng, introSeconds)
+    groundTruth = np.zeros((numFrames, len(PianoKey)), dtype=np.int8)
+    for note in notes:
+        groundTruth[note.startFrame : note.endFrame, note.keyIndex] = handCodes[
+            note.hand
+        ]
+
+    fallSpeed = height * 0.75 / (2 * fps)  # Notes take two seconds to fall
+    writer = cv2.VideoWriter(
+        path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    for frameIndex in range(numFrames):
+        pressedColors = {
+            int(keyIndex): handColors[list(Notation)[groundTruth[frameIndex, keyIndex]]]
+            for keyIndex in np.flatnonzero(groundTruth[frameIndex])
+        }
+        writer.write(
+            drawFrame(
+                frameIndex, width, height, geometry, notes, fallSpeed, pressedColors
+            )
+        )
+    writer.release()
+    return groundTruth
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    groundTruth = renderSyntheticVideo(
+        args.path, args.width, args.height, args.fps, args.seconds, args.seed
+    )
+    np.save(args.path + ".truth.npy", groundTruth)
+    print(f"Wrote {len(groundTruth)} frames to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
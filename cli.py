@@ -0,0 +1,336 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import cv2
+
+from app_logging import logger, LogLevel, stderrSink
+from data_types import AdvancedOptions, PianoKey, PatchReduction, DecodeBackend
+from color_profiles import colorProfilePath
+from key_cache import KeyCache, defaultCacheDir, defaultMaxCacheBytes
+import vision
+
+videoExtensions = (".mp4", ".mov", ".mkv", ".avi", ".webm")
+
+exitSuccess = 0
+exitTranscriptionFailed = 1
+exitUsageError = 2
+
+
+@dataclass
+class TranscriptionResult:
+    videoPath: str
+    outputPath: str
+    succeeded: bool
+    numFrames: int = 0
+    elapsedSeconds: float = 0.0
+    error: str = ""
+
+    @property
+    def framesPerSecond(self) -> float:
+        if self.elapsedSeconds <= 0:
+            return 0.0
+        return self.numFrames / self.elapsedSeconds
+
+
+def initWorker():
+    # Forked workers inherit the parent's sinks, spawned ones start with none
+    logger.sinks = [stderrSink]
+
+
+def collectVideoPaths(paths: list[str]) -> list[str]:
+    videoPaths = []
+    for path in paths:
+        if os.path.isdir(path):
+            videoPaths += sorted(
+                os.path.join(path, fileName)
+                for fileName in os.listdir(path)
+                if fileName.lower().endswith(videoExtensions)
+            )
+        elif os.path.isfile(path):
+            videoPaths.append(path)
+        else:
+            logger.sendLog(f"Skipping missing path: {path}.", LogLevel.WARN)
+    return videoPaths
+
+
+def outputPathFor(videoPath: str, outputDir: str | None) -> str:
+    baseName = os.path.splitext(os.path.basename(videoPath))[0] + ".mid"
+    return os.path.join(outputDir or os.path.dirname(videoPath), baseName)
+
+
+def transcribeOne(
+    videoPath: str,
+    outputPath: str,
+    advancedOptions: AdvancedOptions,
+    detectionFrame: int,
+    keyCache: KeyCache,
+) -> TranscriptionResult:
+    start = time.perf_counter()
+    try:
+        video = cv2.VideoCapture(videoPath)
+        if not video.isOpened():
+            raise RuntimeError("Unable to open video file")
+        numFrames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        if advancedOptions.autoCalibrate:
+            calibration = vision.calibrateKeyDetection(
+                vision.sampleCalibrationFrames(video, detectionFrame)
+            )
+            if calibration is None:
+                logger.sendLog(
+                    f"Auto-calibration could not find a keyboard in {videoPath}, using the manual key detection settings.",
+                    LogLevel.WARN,
+                )
+            else:
+                advancedOptions = vision.applyCalibration(advancedOptions, calibration)
+        keyboardFrame = None
+        if advancedOptions.autoTrim:
+            # The detection frame may belong to an intro without a keyboard
+            keyboardFrame = vision.findKeyboardFrame(
+                video, advancedOptions, detectionFrame
+            )
+            if keyboardFrame is None:
+                logger.sendLog(
+                    f"No frame of {videoPath} shows a keyboard, detecting keys on frame {detectionFrame}.",
+                    LogLevel.WARN,
+                )
+            elif keyboardFrame[0] != detectionFrame:
+                logger.sendLog(
+                    f"Detecting keys on frame {keyboardFrame[0]} of {videoPath}, frame {detectionFrame} shows no keyboard.",
+                    LogLevel.INFO,
+                )
+        if keyboardFrame is None:
+            video.set(cv2.CAP_PROP_POS_FRAMES, detectionFrame)
+            ret, frame = video.read()
+        else:
+            ret, frame = True, keyboardFrame[1]
+        video.release()
+        if not ret:
+            raise RuntimeError(f"Unable to read frame {detectionFrame}")
+        keyLocations = vision.determineKeyLocations(frame, advancedOptions)
+        vision.transcribeVideo(
+            videoPath, keyLocations, advancedOptions, outputPath, keyCache=keyCache
+        )
+    except Exception as e:
+        return TranscriptionResult(
+            videoPath,
+            outputPath,
+            False,
+            elapsedSeconds=time.perf_counter() - start,
+            error=str(e),
+        )
+    return TranscriptionResult(
+        videoPath, outputPath, True, numFrames, time.perf_counter() - start
+    )
+
+
+def parseArgs(argv: list[str] | None = None) -> argparse.Namespace:
+    defaults = AdvancedOptions()
+    parser = argparse.ArgumentParser(
+        description="Transcribe Synthesia videos to MIDI without the GUI."
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="Video files, or directories of video files."
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="Directory for MIDI files (default: next to video)."
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of videos to transcribe concurrently.",
+    )
+    parser.add_argument(
+        "--detection-frame",
+        type=int,
+        default=0,
+        help="Frame used to detect key locations.",
+    )
+    parser.add_argument(
+        "--no-auto-calibrate",
+        action="store_true",
+        help="Use the key detection settings below instead of calibrating them.",
+    )
+    parser.add_argument("--key-offset", type=int, default=defaults.keyOffset)
+    parser.add_argument(
+        "--key-difference-threshold",
+        type=int,
+        default=defaults.keyDifferenceThreshold,
+    )
+    parser.add_argument(
+        "--starting-key",
+        choices=[key.name for key in PianoKey],
+        default=defaults.startingKey.name,
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=defaults.numWorkers,
+        help="Scanning worker processes per video.",
+    )
+    parser.add_argument(
+        "--patch-width",
+        type=int,
+        default=defaults.patchWidth,
+        help="Width in pixels of the patch sampled around each key.",
+    )
+    parser.add_argument(
+        "--patch-height",
+        type=int,
+        default=defaults.patchHeight,
+        help="Height in pixels of the patch sampled around each key.",
+    )
+    parser.add_argument(
+        "--patch-reduction",
+        choices=[reduction.value for reduction in PatchReduction],
+        default=defaults.patchReduction.value,
+    )
+    parser.add_argument(
+        "--decode-backend",
+        choices=[backend.value for backend in DecodeBackend],
+        default=defaults.decodeBackend.value,
+        help="ffmpeg crops to the key band before converting frames, if installed.",
+    )
+    parser.add_argument(
+        "--sampler-threads",
+        type=int,
+        default=defaults.samplerThreads,
+        help="Threads sampling keys while the next frames decode (0 = inline).",
+    )
+    parser.add_argument(
+        "--no-skip-static-frames",
+        action="store_true",
+        help="Store every frame's key samples, even when nothing changed.",
+    )
+    parser.add_argument(
+        "--static-frame-tolerance",
+        type=int,
+        default=defaults.staticFrameTolerance,
+        help="Largest key color change treated as an unchanged frame.",
+    )
+    parser.add_argument(
+        "--auto-trim",
+        action="store_true",
+        help="Skip intro and outro frames without a visible keyboard.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Label frames in batches in constant memory. Colors are fitted on "
+        "the first 3600 frames and the key cache is not used.",
+    )
+    parser.add_argument(
+        "--color-components",
+        type=int,
+        default=defaults.colorComponents,
+        help="Color clusters to fit, 0 selects the count per video "
+        "(uses --num-workers processes).",
+    )
+    parser.add_argument(
+        "--color-profile",
+        default=defaults.colorProfile,
+        help="Name or .json path of a saved color model to reuse across videos. "
+        "It is created from the first video if missing and refitted per video "
+        "when the colors do not match.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run under cProfile and tracemalloc and write a .profile.json report "
+        "of peak memory and the slowest functions.",
+    )
+    parser.add_argument(
+        "--timings-json",
+        action="store_true",
+        help="Write stage timings to a .timings.json file next to each MIDI file.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always decode videos instead of reusing cached key samples.",
+    )
+    parser.add_argument("--cache-dir", default=defaultCacheDir)
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=defaultMaxCacheBytes // 1024**2,
+        help="Least recently used entries are evicted above this size.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parseArgs(argv)
+    logger.addSink(stderrSink)
+    advancedOptions = AdvancedOptions(
+        keyOffset=args.key_offset,
+        keyDifferenceThreshold=args.key_difference_threshold,
+        startingKey=PianoKey[args.starting_key],
+        numWorkers=args.num_workers,
+        useKeyCache=not args.no_cache,
+        profileRun=args.profile,
+        autoCalibrate=not args.no_auto_calibrate,
+        patchWidth=args.patch_width,
+        patchHeight=args.patch_height,
+        patchReduction=PatchReduction(args.patch_reduction),
+        decodeBackend=DecodeBackend(args.decode_backend),
+        samplerThreads=args.sampler_threads,
+        colorProfile=args.color_profile,
+        colorComponents=args.color_components,
+        skipStaticFrames=not args.no_skip_static_frames,
+        staticFrameTolerance=args.static_frame_tolerance,
+        autoTrim=args.auto_trim,
+        writeTimings=args.timings_json,
+        streamTranscription=args.stream,
+    )
+    if args.color_profile:
+        try:
+            colorProfilePath(args.color_profile)
+        except ValueError as e:
+            logger.sendLog(str(e), LogLevel.ERROR)
+            return exitUsageError
+    keyCache = KeyCache(args.cache_dir, args.cache_size_mb * 1024**2)
+
+    videoPaths = collectVideoPaths(args.paths)
+    if not videoPaths:
+        logger.sendLog("No video files found.", LogLevel.ERROR)
+        return exitUsageError
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    outputPaths = [outputPathFor(path, args.output_dir) for path in videoPaths]
+
+    jobs = max(min(args.jobs, len(videoPaths)), 1)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initWorker) as executor:
+        futures = [
+            executor.submit(
+                transcribeOne,
+                videoPath,
+                outputPath,
+                advancedOptions,
+                args.detection_frame,
+                keyCache,
+            )
+            for videoPath, outputPath in zip(videoPaths, outputPaths)
+        ]
+        results = [future.result() for future in futures]
+
+    for result in results:
+        if result.succeeded:
+            logger.sendLog(
+                f"{result.videoPath} -> {result.outputPath}: {result.numFrames} frames in {result.elapsedSeconds:.1f}s ({result.framesPerSecond:.1f} frames/s).",
+                LogLevel.INFO,
+            )
+        else:
+            logger.sendLog(f"{result.videoPath} failed: {result.error}", LogLevel.ERROR)
+    if all(result.succeeded for result in results):
+        return exitSuccess
+    return exitTranscriptionFailed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
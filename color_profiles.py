@@ -0,0 +1,77 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+import numpy as np
+from app_logging import logger, LogLevel
+
+defaultProfileDir = os.environ.get(
+    "SYNTHESIA_TRANSLATOR_PROFILES",
+    os.path.join(
+        os.path.expanduser("~"), ".config", "synthesia_translator", "color_profiles"
+    ),
+)
+profileNamePattern = re.compile(r"^[\w.-]+$")
+profileFormatVersion = 1
+
+
+@dataclass
+class ColorProfile:
+    # Fitted GMM parameters in (H, S, V) space
+    weights: np.ndarray
+    means: np.ndarray
+    covariances: np.ndarray
+    # Maps each GMM component to the Notation value it represents
+    labelMap: dict[int, str]
+    # Colors less likely than this were rare in the video the profile was
+    # fitted on, so a video with many of them has different colors
+    outlierLogLikelihood: float
+
+
+def colorProfilePath(nameOrPath: str, profileDir: str = defaultProfileDir) -> str:
+    # Anything that looks like a path is used as is, bare names live in profileDir
+    if os.sep in nameOrPath or nameOrPath.endswith(".json"):
+        return nameOrPath
+    if not profileNamePattern.match(nameOrPath):
+        raise ValueError(f"Invalid color profile name: {nameOrPath!r}")
+    return os.path.join(profileDir, f"{nameOrPath}.json")
+
+
+def loadColorProfile(path: str) -> ColorProfile | None:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as profileFile:
+            data = json.load(profileFile)
+        if data.get("version") != profileFormatVersion:
+            raise ValueError(f"unsupported version {data.get('version')}")
+        return ColorProfile(
+            np.array(data["weights"], dtype=float),
+            np.array(data["means"], dtype=float),
+            np.array(data["covariances"], dtype=float),
+            {int(component): notation for component, notation in data["labelMap"]},
+            float(data["outlierLogLikelihood"]),
+        )
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.sendLog(f"Ignoring unreadable color profile {path}: {e}", LogLevel.WARN)
+        return None
+
+
+def saveColorProfile(path: str, profile: ColorProfile):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = {
+        "version": profileFormatVersion,
+        "weights": profile.weights.tolist(),
+        "means": profile.means.tolist(),
+        "covariances": profile.covariances.tolist(),
+        "labelMap": sorted(profile.labelMap.items()),
+        "outlierLogLikelihood": profile.outlierLogLikelihood,
+    }
+    # Write to a per-process temporary name first so parallel workers never
+    # read or replace a partial file
+    temporaryPath = f"{path}.{os.getpid()}.tmp"
+    with open(temporaryPath, "w") as profileFile:
+        json.dump(data, profileFile, indent=2)
+    os.replace(temporaryPath, path)
@@ -1,5 +1,6 @@
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import numpy as np
 
 
 class Notation(Enum):
@@ -99,8 +100,139 @@ class PianoKey(Enum):
     C8 = 87
 
 
+class DecodeBackend(Enum):
+    OpenCv = "opencv"
+    # Crops to the key band inside a local ffmpeg process
+    Ffmpeg = "ffmpeg"
+
+
+class PatchReduction(Enum):
+    Mean = "mean"
+    Median = "median"
+
+
 @dataclass
 class AdvancedOptions:
     keyOffset: int = 20
     keyDifferenceThreshold: int = 25
     startingKey: PianoKey = PianoKey.A0
+    numWorkers: int = 1
+    useKeyCache: bool = True
+    profileRun: bool = False
+    autoCalibrate: bool = True
+    # Each key is sampled as a small patch around its location and reduced to
+    # one color, which is less sensitive to compression noise than one pixel
+    patchWidth: int = 3
+    patchHeight: int = 5
+    patchReduction: PatchReduction = PatchReduction.Mean
+    decodeBackend: DecodeBackend = DecodeBackend.OpenCv
+    # Threads sampling keys while the next frames decode, 0 samples inline
+    samplerThreads: int = 0
+    # Name or path of a saved color model reused instead of fitting one per
+    # video, empty fits every video from scratch
+    colorProfile: str = ""
+    # Gaussian mixture components used to cluster key colors, 0 selects the
+    # count and covariance type per video by BIC
+    colorComponents: int = 4
+    # Frames whose sampled keys all stay within staticFrameTolerance of the
+    # last stored frame are stored as a repeat count instead of a new row
+    skipStaticFrames: bool = True
+    staticFrameTolerance: int = 4
+    # Skip intro and outro frames in which no keyboard is visible
+    autoTrim: bool = False
+    # Write the stage timings of every run to a .timings.json next to the
+    # output, without the overhead of profileRun
+    writeTimings: bool = False
+    # Label frames in batches and keep only key runs, so memory stays flat on
+    # long videos. Colors are fitted on a sample of the first 3600 frames (one
+    # minute at 60 fps), and the key cache and parallel scanning are not used.
+    streamTranscription: bool = False
+
+
+@dataclass
+class KeySamples:
+    # HSV value of every sampled key for every stored frame, shape (rows, keys, 3)
+    samples: np.ndarray
+    keys: list[PianoKey] = field(default_factory=list)
+    # Consecutive video frames each row stands for, None if one row per frame
+    repeats: np.ndarray | None = None
+    # Video frame of the first row
+    startFrame: int = 0
+
+    @property
+    def keyNames(self) -> list[str]:
+        return [key.name for key in self.keys]
+
+    @property
+    def numFrames(self) -> int:
+        if self.repeats is None:
+            return self.samples.shape[0]
+        return int(self.repeats.sum())
+
+    @property
+    def frameSamples(self) -> np.ndarray:
+        # One row per video frame, shape (frames, keys, 3)
+        if self.repeats is None:
+            return self.samples
+        return np.repeat(self.samples, self.repeats, axis=0)
+
+
+@dataclass
+class KeyLabels:
+    # Notation of every key for every frame as an index into list(Notation),
+    # shape (frames, keys)
+    labels: np.ndarray
+    keys: list[PianoKey] = field(default_factory=list)
+    startFrame: int = 0
+
+    @property
+    def keyNames(self) -> list[str]:
+        return [key.name for key in self.keys]
+
+    @property
+    def numFrames(self) -> int:
+        return self.labels.shape[0]
+
+
+@dataclass
+class HandNotes:
+    hand: Notation
+    # One entry per note, in seconds from the start of the video
+    pianoKeys: np.ndarray
+    startTimes: np.ndarray
+    endTimes: np.ndarray
+
+    @property
+    def numNotes(self) -> int:
+        return len(self.pianoKeys)
+
+
+@dataclass
+class KeyTimeline:
+    # Run-length encoded key states: one run per stretch of frames in which a
+    # key keeps its Notation, ordered by key and then by frame
+    keys: list[PianoKey]
+    numFrames: int
+    startFrame: int
+    # Runs of key i are runStarts[keyOffsets[i] : keyOffsets[i + 1]]
+    keyOffsets: np.ndarray
+    # First frame of each run, relative to startFrame
+    runStarts: np.ndarray
+    # Notation of each run as an index into list(Notation)
+    runStates: np.ndarray
+
+    @property
+    def numRuns(self) -> int:
+        return len(self.runStarts)
+
+    @property
+    def runKeyIndices(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.keys)), np.diff(self.keyOffsets))
+
+    @property
+    def runEnds(self) -> np.ndarray:
+        # Each run ends where the next run of the same key starts
+        runEnds = np.empty_like(self.runStarts)
+        runEnds[:-1] = self.runStarts[1:]
+        runEnds[self.keyOffsets[1:][np.diff(self.keyOffsets) > 0] - 1] = self.numFrames
+        return runEnds
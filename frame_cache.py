@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import cv2
+import numpy as np
+
+
+class FrameCache:
+    # Decodes frames for the preview scrubber and keeps a bounded LRU of
+    # downscaled RGB copies, so revisiting or prefetched frames display instantly
+    def __init__(
+        self,
+        videoPath: str,
+        maxBytes: int = 256 * 1024**2,
+        previewWidth: int = 1280,
+        forwardDecodeLimit: int = 48,
+    ):
+        self.video = cv2.VideoCapture(videoPath)
+        self.numFrames = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.video.get(cv2.CAP_PROP_FPS)
+        frameWidth = int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frameHeight = int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.previewScale = min(previewWidth / max(frameWidth, 1), 1.0)
+        self.previewSize = (
+            max(round(frameWidth * self.previewScale), 1),
+            max(round(frameHeight * self.previewScale), 1),
+        )
+        self.maxBytes = maxBytes
+        # Seeking restarts decoding at the previous keyframe, so short forward
+        # jumps are cheaper to decode through than to seek
+        self.forwardDecodeLimit = forwardDecodeLimit
+        self.position = 0
+        self.previews: OrderedDict[int, np.ndarray] = OrderedDict()
+        self.cachedBytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, frameIndex: int) -> np.ndarray | None:
+        with self.lock:
+            preview = self.previews.get(frameIndex)
+            if preview is not None:
+                self.previews.move_to_end(frameIndex)
+            return preview
+
+    def contains(self, frameIndex: int) -> bool:
+        with self.lock:
+            return frameIndex in self.previews
+
+    def seek(self, frameIndex: int):
+        if not self.position <= frameIndex < self.position + self.forwardDecodeLimit:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, frameIndex)
+            self.position = frameIndex
+        while self.position < frameIndex:
+            self.video.grab()
+            self.position += 1
+
+    def decode(self, frameIndex: int) -> np.ndarray | None:
+        # Returns the full-resolution BGR frame and caches its preview.
+        # Only one thread may decode at a time.
+        if not 0 <= frameIndex < self.numFrames:
+            return None
+        self.seek(frameIndex)
+        ret, frame = self.video.read()
+        if not ret:
+            # Force a real seek next time, the decoder position is unknown
+            self.position = -self.forwardDecodeLimit
+            return None
+        self.position += 1
+        self.store(frameIndex, frame)
+        return frame
+
+    def prefetch(self, startFrame: int, endFrame: int, shouldStop: Callable[[], bool]):
+        # Decodes [startFrame, endFrame) in order until shouldStop() returns
+        # True. Cached frames are skipped; seek() grabs past them cheaply.
+        for frameIndex in range(max(startFrame, 0), min(endFrame, self.numFrames)):
+            if shouldStop():
+                return
+            if self.contains(frameIndex):
+                continue
+            if self.decode(frameIndex) is None:
+                return
+
+    def store(self, frameIndex: int, frame: np.ndarray):
+        preview = cv2.resize(frame, self.previewSize, interpolation=cv2.INTER_AREA)
+        preview = cv2.cvtColor(preview, cv2.COLOR_BGR2RGB)
+        with self.lock:
+            if frameIndex in self.previews:
+                self.cachedBytes -= self.previews.pop(frameIndex).nbytes
+            self.previews[frameIndex] = preview
+            self.cachedBytes += preview.nbytes
+            while self.cachedBytes > self.maxBytes and len(self.previews) > 1:
+                _, evicted = self.previews.popitem(last=False)
+                self.cachedBytes -= evicted.nbytes
+
+    def release(self):
+        self.video.release()
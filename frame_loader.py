@@ -0,0 +1,56 @@
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+from frame_cache import FrameCache
+
+
+class FrameLoader(QObject):
+    # Decodes scrubber frames on a worker thread. Only the most recent request
+    # is served; once it is delivered, neighboring frames are prefetched.
+    # frameIndex, full-resolution BGR frame
+    frameReady = pyqtSignal(int, object)
+
+    def __init__(self, frameCache: FrameCache, prefetchRadius: int = 8):
+        super().__init__()
+        self.frameCache = frameCache
+        self.prefetchRadius = prefetchRadius
+        self.condition = threading.Condition()
+        self.requestedFrame: int | None = None
+        self.stopped = False
+
+    def request(self, frameIndex: int):
+        # Called from the GUI thread; replaces any request not yet started
+        with self.condition:
+            self.requestedFrame = frameIndex
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def hasNewRequest(self) -> bool:
+        return self.stopped or self.requestedFrame is not None
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.hasNewRequest():
+                    self.condition.wait()
+                if self.stopped:
+                    break
+                frameIndex = self.requestedFrame
+                self.requestedFrame = None
+            frame = self.frameCache.decode(frameIndex)
+            if frame is not None:
+                self.frameReady.emit(frameIndex, frame)
+            # Forward neighbors continue from the decoder position, backward
+            # ones need a single seek and then decode forward
+            self.frameCache.prefetch(
+                frameIndex + 1,
+                frameIndex + 1 + self.prefetchRadius,
+                self.hasNewRequest,
+            )
+            self.frameCache.prefetch(
+                frameIndex - self.prefetchRadius, frameIndex, self.hasNewRequest
+            )
+        self.frameCache.release()
@@ -0,0 +1,195 @@
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+from app_logging import logger, LogLevel
+from data_types import DecodeBackend
+
+
+class FrameSource:
+    # Common interface of the decoders the key scan reads from. Frames cover
+    # cropRect = (x, y, width, height) of the full video frame.
+    def __init__(self):
+        self.numFrames = 0
+        self.fps = 0.0
+        self.cropRect = (0, 0, 0, 0)
+        # Bytes of decoded frames handed to the caller, to compare backends
+        self.bytesRead = 0
+
+    def read(self, out: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        # Decodes into out when given, which must match the cropped frame size
+        raise NotImplementedError
+
+    def seek(self, frameIndex: int) -> int:
+        # Returns the frame the decoder actually landed on
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.release()
+
+
+class OpenCvFrameSource(FrameSource):
+    def __init__(self, videoPath: str):
+        super().__init__()
+        self.video = cv2.VideoCapture(videoPath)
+        if not self.video.isOpened():
+            raise RuntimeError(f"Unable to open video file {videoPath}")
+        self.numFrames = int(self.video.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.video.get(cv2.CAP_PROP_FPS)
+        self.cropRect = (
+            0,
+            0,
+            int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        )
+
+    def read(self, out: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        ret, frame = self.video.read(out)
+        if ret:
+            self.bytesRead += frame.nbytes
+        return ret, frame
+
+    def seek(self, frameIndex: int) -> int:
+        self.video.set(cv2.CAP_PROP_POS_FRAMES, frameIndex)
+        return int(self.video.get(cv2.CAP_PROP_POS_FRAMES))
+
+    def release(self):
+        self.video.release()
+
+
+class FfmpegFrameSource(FrameSource):
+    # Decodes with a local ffmpeg process that crops to the key band before
+    # converting to BGR, so only that band is converted and piped. Reads without
+    # an out buffer all fill the same internal buffer, so the returned frame is
+    # overwritten by the next read.
+    def __init__(
+        self,
+        videoPath: str,
+        cropRect: tuple[int, int, int, int] | None = None,
+        ffmpegPath: str = "ffmpeg",
+    ):
+        super().__init__()
+        self.videoPath = videoPath
+        self.ffmpegPath = ffmpegPath
+        # OpenCV reads the container metadata, so frame counts match its backend
+        video = cv2.VideoCapture(videoPath)
+        if not video.isOpened():
+            raise RuntimeError(f"Unable to open video file {videoPath}")
+        self.numFrames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = video.get(cv2.CAP_PROP_FPS)
+        frameWidth = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+        frameHeight = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        video.release()
+        self.cropRect = alignCropRect(
+            cropRect or (0, 0, frameWidth, frameHeight), frameWidth, frameHeight
+        )
+        _, _, width, height = self.cropRect
+        self.buffer = np.empty((height, width, 3), dtype=np.uint8)
+        self.bufferView = memoryview(self.buffer).cast("B")
+        self.process: subprocess.Popen | None = None
+        self.errorLog = None
+        self.start(0)
+
+    def start(self, frameIndex: int):
+        self.stopProcess()
+        x, y, width, height = self.cropRect
+        command = [self.ffmpegPath, "-v", "error", "-nostdin"]
+        if frameIndex > 0:
+            # Input seeking is frame accurate: ffmpeg decodes from the previous
+            # keyframe and drops frames up to the timestamp
+            command += ["-ss", f"{frameIndex / self.fps:.6f}"]
+        command += [
+            "-i",
+            self.videoPath,
+            "-an",
+            "-vf",
+            f"crop={width}:{height}:{x}:{y}",
+            "-vsync",
+            "passthrough",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "pipe:1",
+        ]
+        # Errors go to a file, since a pipe nobody reads until the end fills up
+        # on a damaged stream and blocks ffmpeg
+        self.errorLog = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=self.errorLog, bufsize=0
+        )
+
+    def read(self, out: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        frame = self.buffer if out is None else out
+        bufferView = self.bufferView if out is None else memoryview(out).cast("B")
+        filled = 0
+        while filled < len(bufferView):
+            numBytes = self.process.stdout.readinto(bufferView[filled:])
+            if not numBytes:
+                self.reportErrors()
+                return False, None
+            filled += numBytes
+        self.bytesRead += filled
+        return True, frame
+
+    def seek(self, frameIndex: int) -> int:
+        self.start(frameIndex)
+        return frameIndex
+
+    def reportErrors(self, maxErrorBytes: int = 4096):
+        if self.process.wait() != 0:
+            # The last errors are the ones that stopped decoding
+            errorSize = self.errorLog.seek(0, 2)
+            self.errorLog.seek(max(errorSize - maxErrorBytes, 0))
+            error = self.errorLog.read().decode(errors="replace").strip()
+            logger.sendLog(f"ffmpeg failed on {self.videoPath}: {error}", LogLevel.WARN)
+
+    def stopProcess(self):
+        if self.process is None:
+            return
+        self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+        self.errorLog.close()
+        self.process = None
+
+    def release(self):
+        self.stopProcess()
+
+
+def alignCropRect(
+    cropRect: tuple[int, int, int, int], frameWidth: int, frameHeight: int
+) -> tuple[int, int, int, int]:
+    # Clamp to the frame and grow to even coordinates, since ffmpeg rounds crop
+    # offsets to the chroma subsampling of 4:2:0 video
+    x, y, width, height = cropRect
+    left = max(x, 0) // 2 * 2
+    top = max(y, 0) // 2 * 2
+    right = min((x + width + 1) // 2 * 2, frameWidth)
+    bottom = min((y + height + 1) // 2 * 2, frameHeight)
+    return left, top, max(right - left, 2), max(bottom - top, 2)
+
+
+def openFrameSource(
+    videoPath: str,
+    decodeBackend: DecodeBackend,
+    cropRect: tuple[int, int, int, int] | None = None,
+) -> FrameSource:
+    if decodeBackend == DecodeBackend.Ffmpeg:
+        ffmpegPath = shutil.which("ffmpeg")
+        if ffmpegPath:
+            return FfmpegFrameSource(videoPath, cropRect, ffmpegPath)
+        logger.sendLog(
+            "ffmpeg was not found on PATH, decoding with OpenCV instead.",
+            LogLevel.WARN,
+        )
+    return OpenCvFrameSource(videoPath)
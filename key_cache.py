@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import numpy as np
+from data_types import AdvancedOptions, KeySamples, PianoKey
+from app_logging import logger, LogLevel
+
+defaultCacheDir = os.environ.get(
+    "SYNTHESIA_TRANSLATOR_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "synthesia_translator", "keys"),
+)
+defaultMaxCacheBytes = 2 * 1024**3
+
+
+def videoContentHash(
+    videoPath: str, blockSize: int = 1024**2, numBlocks: int = 64
+) -> str:
+    # Hash the file size and evenly spaced blocks rather than the whole file,
+    # which keeps hashing multi-gigabyte videos fast
+    fileSize = os.path.getsize(videoPath)
+    digest = hashlib.blake2b(str(fileSize).encode(), digest_size=16)
+    with open(videoPath, "rb") as videoFile:
+        if fileSize <= blockSize * numBlocks:
+            digest.update(videoFile.read())
+        else:
+            stride = (fileSize - blockSize) // (numBlocks - 1)
+            for i in range(numBlocks):
+                videoFile.seek(i * stride)
+                digest.update(videoFile.read(blockSize))
+    return digest.hexdigest()
+
+
+def keySamplesCacheKey(
+    videoPath: str,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+) -> str:
+    settings = {
+        "video": videoContentHash(videoPath),
+        "keyOffset": advancedOptions.keyOffset,
+        "keyLocations": [[int(x), int(y)] for x, y in keyLocations],
+        "startingKey": advancedOptions.startingKey.name,
+        "patch": [
+            advancedOptions.patchWidth,
+            advancedOptions.patchHeight,
+            advancedOptions.patchReduction.value,
+        ],
+        "decodeBackend": advancedOptions.decodeBackend.value,
+        "staticFrameTolerance": (
+            advancedOptions.staticFrameTolerance
+            if advancedOptions.skipStaticFrames
+            else None
+        ),
+        "autoTrim": advancedOptions.autoTrim,
+    }
+    encoded = json.dumps(settings, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class KeyCache:
+    # Sampled key arrays stored as .npy files that are memory-mapped on load,
+    # evicted least recently used first once the cache exceeds maxBytes
+    def __init__(
+        self, cacheDir: str = defaultCacheDir, maxBytes: int = defaultMaxCacheBytes
+    ):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+
+    def samplesPath(self, key: str) -> str:
+        return os.path.join(self.cacheDir, f"{key}.npy")
+
+    def metadataPath(self, key: str) -> str:
+        return os.path.join(self.cacheDir, f"{key}.json")
+
+    def repeatsPath(self, key: str) -> str:
+        return os.path.join(self.cacheDir, f"{key}.repeats.npy")
+
+    def entryPaths(self, key: str) -> list[str]:
+        return [self.samplesPath(key), self.metadataPath(key), self.repeatsPath(key)]
+
+    def load(self, key: str) -> KeySamples | None:
+        samplesPath = self.samplesPath(key)
+        metadataPath = self.metadataPath(key)
+        if not (os.path.exists(samplesPath) and os.path.exists(metadataPath)):
+            return None
+        try:
+            with open(metadataPath) as metadataFile:
+                metadata = json.load(metadataFile)
+            samples = np.load(samplesPath, mmap_mode="r")
+            repeats = (
+                np.load(self.repeatsPath(key)) if metadata.get("hasRepeats") else None
+            )
+        except (OSError, ValueError) as e:
+            logger.sendLog(f"Ignoring unreadable cache entry {key}: {e}", LogLevel.WARN)
+            return None
+        # Touching the files marks the entry as recently used
+        os.utime(samplesPath)
+        os.utime(metadataPath)
+        return KeySamples(
+            samples,
+            [PianoKey[name] for name in metadata["keys"]],
+            repeats,
+            metadata.get("startFrame", 0),
+        )
+
+    def store(self, key: str, keySamples: KeySamples):
+        os.makedirs(self.cacheDir, exist_ok=True)
+        samplesPath = self.samplesPath(key)
+        metadataPath = self.metadataPath(key)
+        # Write to temporary names first so readers never see a partial entry
+        with open(samplesPath + ".tmp", "wb") as samplesFile:
+            np.save(samplesFile, np.ascontiguousarray(keySamples.samples))
+        if keySamples.repeats is not None:
+            repeatsPath = self.repeatsPath(key)
+            with open(repeatsPath + ".tmp", "wb") as repeatsFile:
+                np.save(repeatsFile, keySamples.repeats)
+            os.replace(repeatsPath + ".tmp", repeatsPath)
+        with open(metadataPath + ".tmp", "w") as metadataFile:
+            json.dump(
+                {
+                    "keys": keySamples.keyNames,
+                    "hasRepeats": keySamples.repeats is not None,
+                    "startFrame": keySamples.startFrame,
+                },
+                metadataFile,
+            )
+        os.replace(samplesPath + ".tmp", samplesPath)
+        os.replace(metadataPath + ".tmp", metadataPath)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for fileName in os.listdir(self.cacheDir):
+            if not fileName.endswith(".npy") or fileName.endswith(".repeats.npy"):
+                continue
+            key = fileName[: -len(".npy")]
+            samplesPath = self.samplesPath(key)
+            stat = os.stat(samplesPath)
+            entries.append((stat.st_mtime, stat.st_size, key))
+        totalBytes = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if totalBytes <= self.maxBytes:
+                break
+            for path in self.entryPaths(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            totalBytes -= size
+            logger.sendLog(f"Evicted cached key samples {key}.", LogLevel.DEBUG)
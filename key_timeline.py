@@ -0,0 +1,185 @@
+import struct
+import zlib
+import numpy as np
+from data_types import HandNotes, KeyLabels, KeyTimeline, Notation, PianoKey
+
+timelineMagic = b"SKTL"
+timelineVersion = 1
+# Magic, version, number of keys, frames, start frame and runs
+timelineHeader = struct.Struct("<4sBHIII")
+handCodes = {
+    hand: code
+    for code, hand in enumerate(Notation)
+    if hand in (Notation.LeftHand, Notation.RightHand)
+}
+
+
+class KeyTimelineBuilder:
+    # Encodes labels arriving in consecutive batches. Only each key's current
+    # state is kept between batches, so a run still open at the end of one
+    # batch simply continues into the next.
+    def __init__(self):
+        self.keys: list[PianoKey] | None = None
+        self.startFrame = 0
+        self.numFrames = 0
+        self.lastStates: np.ndarray | None = None
+        self.runKeys: list[np.ndarray] = []
+        self.runStarts: list[np.ndarray] = []
+        self.runStates: list[np.ndarray] = []
+
+    def add(self, keyLabels: KeyLabels):
+        if self.keys is None:
+            self.keys = list(keyLabels.keys)
+            self.startFrame = keyLabels.startFrame
+        labels = keyLabels.labels
+        if not len(labels):
+            return
+        # Find state changes in the frame-major layout the labels are stored in,
+        # counting the first frame of the video as a change for every key
+        changed = np.empty_like(labels, dtype=bool)
+        if self.lastStates is None:
+            changed[0] = True
+        else:
+            np.not_equal(labels[0], self.lastStates, out=changed[0])
+        np.not_equal(labels[1:], labels[:-1], out=changed[1:])
+        changeFrames, changeKeys = np.nonzero(changed)
+        self.runKeys.append(changeKeys)
+        self.runStarts.append(changeFrames + self.numFrames)
+        self.runStates.append(labels[changeFrames, changeKeys].astype(np.int8))
+        self.lastStates = labels[-1].copy()
+        self.numFrames += len(labels)
+
+    def finish(self) -> KeyTimeline:
+        keys = self.keys or []
+        runKeys = np.concatenate([np.zeros(0, dtype=np.intp), *self.runKeys])
+        runStarts = np.concatenate([np.zeros(0, dtype=np.int64), *self.runStarts])
+        runStates = np.concatenate([np.zeros(0, dtype=np.int8), *self.runStates])
+        # Order the (much fewer) runs by key
+        order = np.lexsort((runStarts, runKeys))
+        keyOffsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(runKeys, minlength=len(keys)), out=keyOffsets[1:])
+        return KeyTimeline(
+            keys,
+            self.numFrames,
+            self.startFrame,
+            keyOffsets,
+            runStarts[order],
+            runStates[order],
+        )
+
+
+def encodeKeyTimeline(keyLabels: KeyLabels) -> KeyTimeline:
+    timelineBuilder = KeyTimelineBuilder()
+    timelineBuilder.add(keyLabels)
+    return timelineBuilder.finish()
+
+
+def decodeKeyTimeline(timeline: KeyTimeline) -> KeyLabels:
+    # Every key's runs cover all frames, so expanding the runs in order fills
+    # the grid one key at a time
+    runLengths = timeline.runEnds - timeline.runStarts
+    labels = np.repeat(timeline.runStates, runLengths).reshape(
+        len(timeline.keys), timeline.numFrames
+    )
+    return KeyLabels(
+        np.ascontiguousarray(labels.T), list(timeline.keys), timeline.startFrame
+    )
+
+
+def keyStatesAt(timeline: KeyTimeline, frame: int) -> np.ndarray:
+    # Notation code of every key at an absolute video frame
+    relativeFrame = frame - timeline.startFrame
+    if not 0 <= relativeFrame < timeline.numFrames:
+        raise IndexError(f"Frame {frame} is outside the timeline.")
+    # Runs sorted by key then frame are also sorted by key * numFrames + frame,
+    # so one binary search finds the run covering the frame for every key
+    runPositions = timeline.runKeyIndices * timeline.numFrames + timeline.runStarts
+    queries = np.arange(len(timeline.keys)) * timeline.numFrames + relativeFrame
+    return timeline.runStates[np.searchsorted(runPositions, queries, "right") - 1]
+
+
+def activeNotes(
+    timeline: KeyTimeline,
+    fps: float,
+    startFrame: int | None = None,
+    endFrame: int | None = None,
+) -> list[HandNotes]:
+    # Notes of each hand sounding in [startFrame, endFrame) of the video, with
+    # their full start and end times
+    startFrame = timeline.startFrame if startFrame is None else startFrame
+    if endFrame is None:
+        endFrame = timeline.startFrame + timeline.numFrames
+    runStarts = timeline.runStarts + timeline.startFrame
+    runEnds = timeline.runEnds + timeline.startFrame
+    overlapping = (runStarts < endFrame) & (runEnds > startFrame)
+    keyValues = np.array([key.value for key in timeline.keys], dtype=np.int64)
+    runKeyValues = keyValues[timeline.runKeyIndices]
+    hands = []
+    for hand, code in handCodes.items():
+        notes = overlapping & (timeline.runStates == code)
+        hands.append(
+            HandNotes(
+                hand,
+                runKeyValues[notes],
+                runStarts[notes] / fps,
+                runEnds[notes] / fps,
+            )
+        )
+    return hands
+
+
+def saveKeyTimeline(timeline: KeyTimeline, path: str):
+    header = timelineHeader.pack(
+        timelineMagic,
+        timelineVersion,
+        len(timeline.keys),
+        timeline.numFrames,
+        timeline.startFrame,
+        timeline.numRuns,
+    )
+    # Run lengths repeat far more often than run starts, so they compress better
+    payload = b"".join(
+        [
+            np.array([key.value for key in timeline.keys], dtype=np.uint8).tobytes(),
+            np.diff(timeline.keyOffsets).astype("<u4").tobytes(),
+            (timeline.runEnds - timeline.runStarts).astype("<u4").tobytes(),
+            timeline.runStates.astype(np.int8).tobytes(),
+        ]
+    )
+    with open(path, "wb") as timelineFile:
+        timelineFile.write(header)
+        timelineFile.write(zlib.compress(payload, 9))
+
+
+def loadKeyTimeline(path: str) -> KeyTimeline:
+    with open(path, "rb") as timelineFile:
+        data = timelineFile.read()
+    magic, version, numKeys, numFrames, startFrame, numRuns = (
+        timelineHeader.unpack_from(data)
+    )
+    if magic != timelineMagic or version != timelineVersion:
+        raise ValueError(f"{path} is not a version {timelineVersion} key timeline.")
+    payload = zlib.decompress(data[timelineHeader.size :])
+    keyValues = np.frombuffer(payload, np.uint8, numKeys)
+    offset = numKeys
+    runsPerKey = np.frombuffer(payload, "<u4", numKeys, offset)
+    offset += 4 * numKeys
+    runLengths = np.frombuffer(payload, "<u4", numRuns, offset).astype(np.int64)
+    offset += 4 * numRuns
+    runStates = np.frombuffer(payload, np.int8, numRuns, offset).copy()
+
+    keyOffsets = np.zeros(numKeys + 1, dtype=np.int64)
+    np.cumsum(runsPerKey, out=keyOffsets[1:])
+    # Run starts restart from zero at every key
+    runStarts = np.cumsum(runLengths) - runLengths
+    runStarts -= np.repeat(
+        runStarts[keyOffsets[:-1][runsPerKey > 0]], runsPerKey[runsPerKey > 0]
+    )
+    return KeyTimeline(
+        [PianoKey(value) for value in keyValues],
+        numFrames,
+        startFrame,
+        keyOffsets,
+        runStarts,
+        runStates,
+    )
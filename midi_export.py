@@ -0,0 +1,81 @@
+import struct
+import numpy as np
+from data_types import HandNotes
+
+# PianoKey.A0 is MIDI note 21
+midiNoteOffset = 21
+noteOnStatus = 0x90
+noteOffStatus = 0x80
+defaultVelocity = 80
+
+
+def encodeVariableLength(value: int) -> bytes:
+    encoded = [value & 0x7F]
+    value >>= 7
+    while value:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(encoded))
+
+
+def buildTrackChunk(events: list[tuple[int, bytes]]) -> bytes:
+    # events are (absolute tick, message bytes) and must already be sorted
+    data = bytearray()
+    previousTick = 0
+    for tick, message in events:
+        data += encodeVariableLength(tick - previousTick)
+        data += message
+        previousTick = tick
+    data += b"\x00\xff\x2f\x00"  # End of track
+    return b"MTrk" + struct.pack(">I", len(data)) + bytes(data)
+
+
+def trackName(name: str) -> bytes:
+    encodedName = name.encode("ascii", "replace")
+    return b"\xff\x03" + encodeVariableLength(len(encodedName)) + encodedName
+
+
+def buildHandTrack(handNotes: HandNotes, channel: int, ticksPerSecond: float) -> bytes:
+    numNotes = handNotes.numNotes
+    ticks = np.round(
+        np.concatenate([handNotes.startTimes, handNotes.endTimes]) * ticksPerSecond
+    ).astype(np.int64)
+    isNoteOn = np.concatenate(
+        [np.ones(numNotes, dtype=bool), np.zeros(numNotes, dtype=bool)]
+    )
+    pitches = np.concatenate([handNotes.pianoKeys, handNotes.pianoKeys])
+    pitches = pitches.astype(np.int64) + midiNoteOffset
+    # Sort by time, releasing notes before pressing new ones on the same tick
+    order = np.lexsort((isNoteOn, ticks))
+    statuses = np.where(isNoteOn, noteOnStatus, noteOffStatus) | channel
+    velocities = np.where(isNoteOn, defaultVelocity, 0)
+    messages = np.stack([statuses, pitches, velocities], axis=1).astype(np.uint8)
+
+    events = [(0, trackName(handNotes.hand.name))]
+    events += [
+        (tick, message.tobytes())
+        for tick, message in zip(ticks[order].tolist(), messages[order])
+    ]
+    return buildTrackChunk(events)
+
+
+def writeMidiFile(
+    path: str,
+    hands: list[HandNotes],
+    ticksPerBeat: int = 480,
+    microsecondsPerBeat: int = 500000,
+):
+    ticksPerSecond = ticksPerBeat * 1_000_000 / microsecondsPerBeat
+    # Format 1: a tempo track followed by one track per hand
+    tempoTrack = buildTrackChunk(
+        [(0, b"\xff\x51\x03" + microsecondsPerBeat.to_bytes(3, "big"))]
+    )
+    tracks = [tempoTrack] + [
+        buildHandTrack(handNotes, channel, ticksPerSecond)
+        for channel, handNotes in enumerate(hands)
+    ]
+    header = b"MThd" + struct.pack(">IHHH", 6, 1, len(tracks), ticksPerBeat)
+    with open(path, "wb") as midiFile:
+        midiFile.write(header)
+        for track in tracks:
+            midiFile.write(track)
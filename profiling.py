@@ -0,0 +1,103 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from app_logging import logger, LogLevel
+
+
+@dataclass
+class StageRecord:
+    seconds: float = 0.0
+    calls: int = 0
+    frames: int = 0
+    # Largest array produced by the stage, in bytes
+    arrayBytes: int = 0
+
+
+class PipelineProfiler:
+    def __init__(self):
+        self.stages: dict[str, StageRecord] = {}
+
+    def reset(self):
+        self.stages = {}
+
+    def record(self, name: str, seconds: float, frames: int = 0, arrayBytes: int = 0):
+        stageRecord = self.stages.setdefault(name, StageRecord())
+        stageRecord.seconds += seconds
+        stageRecord.calls += 1
+        stageRecord.frames += frames
+        stageRecord.arrayBytes = max(stageRecord.arrayBytes, arrayBytes)
+
+    @contextmanager
+    def stage(self, name: str, frames: int = 0, arrayBytes: int = 0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, frames, arrayBytes)
+
+    def summary(self) -> str:
+        totalSeconds = sum(record.seconds for record in self.stages.values())
+        lines = ["Stage timings:"]
+        for name, record in self.stages.items():
+            share = record.seconds / totalSeconds * 100 if totalSeconds else 0
+            line = f"  {name}: {record.seconds:.3f}s ({share:.0f}%)"
+            if record.frames:
+                line += f", {record.frames} frames"
+                if record.seconds > 0:
+                    line += f" ({record.frames / record.seconds:.0f} frames/s)"
+            if record.arrayBytes:
+                line += f", {record.arrayBytes / 1024**2:.1f} MB"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def toDict(self) -> dict:
+        return {name: asdict(record) for name, record in self.stages.items()}
+
+
+profiler = PipelineProfiler()
+
+
+def writeTimingsReport(path: str, wallSeconds: float):
+    report = {"wallSeconds": wallSeconds, "stages": profiler.toDict()}
+    with open(path, "w") as reportFile:
+        json.dump(report, reportFile, indent=2)
+    logger.sendLog(f"Wrote stage timings to {path}.", LogLevel.INFO)
+
+
+@contextmanager
+def profiledRun(reportPath: str, topFunctions: int = 30):
+    # Wraps a run in cProfile and tracemalloc, then writes reportPath + ".json"
+    # (peak memory, hottest functions) and reportPath + ".prof". Stage timings
+    # are left to writeTimingsReport, since both tools slow every stage down.
+    profile = cProfile.Profile()
+    tracemalloc.start()
+    start = time.perf_counter()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        elapsed = time.perf_counter() - start
+        _, peakMemory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profile.dump_stats(reportPath + ".prof")
+        statsText = io.StringIO()
+        stats = pstats.Stats(profile, stream=statsText)
+        stats.sort_stats("cumulative").print_stats(topFunctions)
+        report = {
+            "wallSeconds": elapsed,
+            "peakTracedMemoryMb": peakMemory / 1024**2,
+            "topFunctions": statsText.getvalue(),
+        }
+        with open(reportPath + ".json", "w") as reportFile:
+            json.dump(report, reportFile, indent=2)
+        logger.sendLog(
+            f"Wrote profile report to {reportPath}.json and {reportPath}.prof.",
+            LogLevel.INFO,
+        )
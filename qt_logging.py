@@ -0,0 +1,30 @@
+from collections import deque
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from app_logging import logger
+
+
+class LogEmitter(QObject):
+    # Collects log messages from any thread and delivers them to the GUI thread
+    # in batches, so a burst of messages costs one signal and one widget update
+    logSignal = pyqtSignal(str)
+
+    def __init__(self, parent=None, flushIntervalMs: int = 100):
+        super().__init__(parent)
+        self.pendingMessages: deque[str] = deque()
+        self.flushTimer = QTimer(self)
+        self.flushTimer.timeout.connect(self.flush)
+        self.flushTimer.start(flushIntervalMs)
+
+    def sendMessage(self, message: str):
+        # deque.append is thread-safe, so worker threads never touch Qt here
+        self.pendingMessages.append(message)
+
+    def flush(self):
+        logger.flushSuppressed()
+        messages = []
+        while self.pendingMessages:
+            messages.append(self.pendingMessages.popleft())
+        if messages:
+            self.logSignal.emit("\n".join(messages))
@@ -0,0 +1,148 @@
+import copy
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from frame_sources import FrameSource
+from profiling import profiler
+
+if TYPE_CHECKING:
+    from vision import KeySampler, ScanProgress
+
+
+class SamplingPipeline:
+    # Overlaps decoding with key sampling. A decode thread fills a bounded ring
+    # of reusable frame buffers, sampler threads turn frames into key samples
+    # and hand their buffers back, and the calling thread collects the results
+    # in frame order. When every buffer is in use the decoder waits, so memory
+    # stays bounded however slow the samplers are.
+    def __init__(
+        self,
+        video: FrameSource,
+        keySampler: "KeySampler",
+        maxFrames: int | None = None,
+        numSamplers: int = 1,
+        numBuffers: int = 8,
+    ):
+        self.video = video
+        self.keySampler = keySampler
+        self.maxFrames = maxFrames
+        self.numSamplers = max(numSamplers, 1)
+        _, _, width, height = video.cropRect
+        self.buffers = [
+            np.empty((height, width, 3), dtype=np.uint8)
+            for _ in range(max(numBuffers, self.numSamplers + 1))
+        ]
+        self.freeSlots: queue.Queue[int] = queue.Queue()
+        for slot in range(len(self.buffers)):
+            self.freeSlots.put(slot)
+        # (frameIndex, slot), or None once the decoder has finished
+        self.readyFrames: queue.Queue[tuple[int, int] | None] = queue.Queue()
+        # (frameIndex, samples), or None once a sampler has finished
+        self.results: queue.Queue[tuple[int, np.ndarray] | None] = queue.Queue()
+        self.stopEvent = threading.Event()
+        self.error: BaseException | None = None
+        self.decodeSeconds = 0.0
+        self.sampleSeconds = [0.0] * self.numSamplers
+
+    def fail(self, error: BaseException):
+        if self.error is None:
+            self.error = error
+        self.stopEvent.set()
+
+    def takeFreeSlot(self) -> int | None:
+        # Waits for a sampler to return a buffer, giving up once stopped
+        while not self.stopEvent.is_set():
+            try:
+                return self.freeSlots.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def decodeLoop(self):
+        frameIndex = 0
+        try:
+            while self.maxFrames is None or frameIndex < self.maxFrames:
+                slot = self.takeFreeSlot()
+                if slot is None:
+                    break
+                decodeStart = time.perf_counter()
+                ret, _ = self.video.read(self.buffers[slot])
+                self.decodeSeconds += time.perf_counter() - decodeStart
+                if not ret:
+                    break
+                self.readyFrames.put((frameIndex, slot))
+                frameIndex += 1
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            for _ in range(self.numSamplers):
+                self.readyFrames.put(None)
+
+    def sampleLoop(self, samplerIndex: int):
+        # Each thread keeps its own sampler so gather indices are not shared
+        keySampler = copy.copy(self.keySampler)
+        cropOrigin = self.video.cropRect[:2]
+        try:
+            while (item := self.readyFrames.get()) is not None:
+                frameIndex, slot = item
+                if not self.stopEvent.is_set():
+                    sampleStart = time.perf_counter()
+                    keySamples = keySampler.sample(self.buffers[slot], cropOrigin)
+                    self.sampleSeconds[samplerIndex] += (
+                        time.perf_counter() - sampleStart
+                    )
+                    self.results.put((frameIndex, keySamples))
+                self.freeSlots.put(slot)
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            self.results.put(None)
+
+    def run(
+        self, progress: "ScanProgress | None" = None, progressInterval: int = 30
+    ) -> np.ndarray:
+        capacity = max(self.maxFrames or self.video.numFrames, 1)
+        samples = np.empty((capacity, self.keySampler.numKeys, 3), dtype=np.uint8)
+        threads = [threading.Thread(target=self.decodeLoop, daemon=True)] + [
+            threading.Thread(target=self.sampleLoop, args=(i,), daemon=True)
+            for i in range(self.numSamplers)
+        ]
+        for thread in threads:
+            thread.start()
+        numFrames = 0
+        numFinished = 0
+        try:
+            while numFinished < self.numSamplers:
+                item = self.results.get()
+                if item is None:
+                    numFinished += 1
+                    continue
+                frameIndex, keySamples = item
+                while frameIndex >= capacity:
+                    capacity *= 2
+                    samples = np.resize(samples, (capacity, self.keySampler.numKeys, 3))
+                samples[frameIndex] = keySamples
+                numFrames += 1
+                if progress and numFrames % progressInterval == 0:
+                    progress.advance(progressInterval)
+        except BaseException:
+            # Cancellation or a collector error: stop the threads, then re-raise
+            self.stopEvent.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+        if self.error is not None:
+            raise self.error
+        profiler.record("decode", self.decodeSeconds, numFrames, self.buffers[0].nbytes)
+        # Samplers run concurrently, so this is total sampler CPU time
+        profiler.record(
+            "sampleKeys", sum(self.sampleSeconds), numFrames, samples.nbytes
+        )
+        if progress:
+            progress.advance(numFrames % progressInterval)
+        return samples[:numFrames]
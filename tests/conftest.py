@@ -0,0 +1,23 @@
+# Synthetic keyboard video and key locations shared by the tests.
+
+import pytest
+
+from benchmarks.synthetic_video import keyboardGeometry, renderSyntheticVideo
+from data_types import PianoKey
+
+width, height, fps = 640, 360, 30
+
+
+@pytest.fixture(scope="session")
+def videoPath(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "performance.mp4")
+    renderSyntheticVideo(path, width, height, fps, seconds=10)
+    return path
+
+
+def keyLocations() -> list[tuple[int, int]]:
+    # Key centers inside the black key band of the synthetic keyboard
+    geometry = keyboardGeometry(width)
+    row = int(height * 0.8)
+    centers = (geometry.left + geometry.right) / 2
+    return [(int(x), row) for x in centers[: len(PianoKey)]]
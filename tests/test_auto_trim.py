@@ -0,0 +1,63 @@
+# Trimming finds the same performance range with one or several workers.
+# Run from the project root: python -m pytest tests
+
+from dataclasses import replace
+
+import cv2
+import numpy as np
+import pytest
+
+from data_types import AdvancedOptions, PianoKey
+from frame_sources import openFrameSource
+from vision import decodeKeySamples, determineKeyLocations, findKeyboardFrame
+
+from tests.conftest import fps, height, keyLocations, width
+
+introFrames, outroFrames = 45, 30
+
+
+@pytest.fixture(scope="module")
+def trimmedVideo(videoPath, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "trimmed.mp4")
+    writer = cv2.VideoWriter(
+        path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height)
+    )
+    for _ in range(introFrames):
+        writer.write(np.zeros((height, width, 3), dtype=np.uint8))
+    performance = cv2.VideoCapture(videoPath)
+    while True:
+        ret, frame = performance.read()
+        if not ret:
+            break
+        writer.write(frame)
+    performance.release()
+    for _ in range(outroFrames):
+        writer.write(np.full((height, width, 3), 128, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("skipStaticFrames", [True, False])
+def test_parallelTrimMatchesSequential(trimmedVideo, skipStaticFrames):
+    options = AdvancedOptions(
+        useKeyCache=False, autoTrim=True, skipStaticFrames=skipStaticFrames
+    )
+    sequential = decodeKeySamples(trimmedVideo, keyLocations(), options)
+    parallel = decodeKeySamples(
+        trimmedVideo, keyLocations(), replace(options, numWorkers=2)
+    )
+    with openFrameSource(trimmedVideo, options.decodeBackend) as video:
+        totalFrames = video.numFrames
+    assert sequential.startFrame == introFrames
+    assert sequential.numFrames == totalFrames - introFrames - outroFrames
+    assert parallel.startFrame == sequential.startFrame
+    assert parallel.numFrames == sequential.numFrames
+    np.testing.assert_array_equal(parallel.frameSamples, sequential.frameSamples)
+
+
+def test_findKeyboardFrameSkipsIntro(trimmedVideo):
+    video = cv2.VideoCapture(trimmedVideo)
+    frameIndex, frame = findKeyboardFrame(video, AdvancedOptions())
+    video.release()
+    assert frameIndex >= introFrames
+    assert len(determineKeyLocations(frame, AdvancedOptions())) >= len(PianoKey)
@@ -0,0 +1,48 @@
+# Cancelling a transcription stops scanning and model selection early.
+# Run from the project root: python -m pytest tests
+
+import numpy as np
+import pytest
+
+from data_types import AdvancedOptions
+from frame_sources import OpenCvFrameSource
+from vision import (
+    ScanProgress,
+    TranscriptionCancelled,
+    prepareKeySampling,
+    readKeysParallel,
+    sampleFrames,
+    selectColorMixture,
+)
+
+from tests.conftest import keyLocations
+
+
+def test_sampleFramesStopsWhenAsked(videoPath):
+    _, keySampler = prepareKeySampling(keyLocations(), AdvancedOptions())
+    with OpenCvFrameSource(videoPath) as video:
+        samples, _ = sampleFrames(
+            video, keySampler, progressInterval=10, shouldStop=lambda: True
+        )
+    assert len(samples) == 10
+
+
+def test_parallelScanCancels(videoPath):
+    progress = ScanProgress()
+    progress.cancel()
+    with pytest.raises(TranscriptionCancelled):
+        readKeysParallel(
+            videoPath,
+            keyLocations(),
+            AdvancedOptions(numWorkers=2, useKeyCache=False),
+            progress=progress,
+        )
+
+
+def test_colorSelectionCancels():
+    rng = np.random.default_rng(0)
+    samples = rng.integers(0, 256, size=(2000, 3)).astype(float)
+    progress = ScanProgress()
+    progress.cancel()
+    with pytest.raises(TranscriptionCancelled):
+        selectColorMixture(samples, progress=progress)
@@ -0,0 +1,56 @@
+# Color model selection with several workers, as the CLI runs it.
+# Run from the project root: python -m pytest tests
+
+import os
+import signal
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from vision import selectColorMixture
+
+# Runs selection inside a process pool worker, like cli.transcribeOne
+nestedSelectionScript = """
+from concurrent.futures import ProcessPoolExecutor
+from tests.test_color_selection import selectInWorker
+
+if __name__ == "__main__":
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        print(executor.submit(selectInWorker).result())
+"""
+
+
+def keyColorSamples() -> np.ndarray:
+    # White keys, black keys and two hand colors in HSV
+    rng = np.random.default_rng(0)
+    centers = np.array([[0, 0, 245], [0, 0, 25], [60, 166, 200], [104, 212, 230]])
+    labels = rng.choice(len(centers), size=4000, p=[0.5, 0.3, 0.1, 0.1])
+    return np.round(centers[labels] + rng.normal(0, 2, (len(labels), 3)))
+
+
+def selectInWorker() -> int:
+    return selectColorMixture(keyColorSamples(), numWorkers=2).n_components
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs POSIX process groups")
+def test_selectionPoolExitsInsideWorkerProcess():
+    # A worker process cannot exit while a pool it started still has idle
+    # workers. The script runs in its own process group so a hang can be
+    # cleaned up completely.
+    process = subprocess.Popen(
+        [sys.executable, "-c", nestedSelectionScript],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    try:
+        output, _ = process.communicate(timeout=60)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.communicate()
+        pytest.fail("Color selection left the worker process unable to exit.")
+    assert process.returncode == 0
+    assert int(output) >= 3
@@ -0,0 +1,34 @@
+# Frame source behavior that does not depend on a real ffmpeg install.
+# Run from the project root: python -m pytest tests
+
+import os
+import stat
+
+import cv2
+import numpy as np
+import pytest
+
+from app_logging import logger
+from frame_sources import FfmpegFrameSource
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs a POSIX shell")
+def test_ffmpegErrorFloodDoesNotBlock(tmp_path):
+    videoPath = str(tmp_path / "video.mp4")
+    writer = cv2.VideoWriter(videoPath, cv2.VideoWriter_fourcc(*"mp4v"), 30, (64, 64))
+    writer.write(np.zeros((64, 64, 3), dtype=np.uint8))
+    writer.release()
+    # Far more error output than a pipe buffer holds, written before any frame
+    fakeFfmpeg = tmp_path / "ffmpeg"
+    fakeFfmpeg.write_text(
+        "#!/bin/sh\nyes 'corrupt macroblock' | head -c 1000000 >&2\nexit 1\n"
+    )
+    fakeFfmpeg.chmod(fakeFfmpeg.stat().st_mode | stat.S_IEXEC)
+    messages = []
+    logger.addSink(messages.append)
+    try:
+        with FfmpegFrameSource(videoPath, ffmpegPath=str(fakeFfmpeg)) as video:
+            assert video.read() == (False, None)
+    finally:
+        logger.removeSink(messages.append)
+    assert any("corrupt macroblock" in message for message in messages)
@@ -0,0 +1,88 @@
+# Parity of the vectorized key boundary detection with the loop it replaced.
+# Run from the project root: python -m pytest tests
+
+import numpy as np
+import pytest
+
+from vision import countSettledRuns, findKeyBoundaries
+
+# Value levels a few threshold steps apart, so windows often span exactly a
+# threshold
+levels = np.array([0, 10, 15, 25, 40, 50, 65, 90, 200, 255])
+thresholds = np.array([5, 10, 15, 25, 40])
+
+
+def findKeyBoundariesLoop(
+    keySlice: list[int], keyDifferenceThreshold: int, windowSize: int = 3
+) -> list[tuple[int, int]]:
+    # The previous implementation, kept here as the reference
+    keyBoundaries = []
+    leftEdge = 0
+    i = 0
+    isSettled = False
+    while i < len(keySlice) - windowSize + 1:
+        window = keySlice[i : i + windowSize]
+        maxDiff = max(window) - min(window)
+        if maxDiff >= keyDifferenceThreshold and isSettled:
+            keyBoundaries.append((leftEdge, i + 1))
+            leftEdge = i
+            isSettled = False
+        elif maxDiff <= keyDifferenceThreshold and not isSettled:
+            isSettled = True
+            leftEdge = i
+        i += 1
+    keyBoundaries.append((leftEdge, len(keySlice) - 1))
+    return keyBoundaries
+
+
+def randomKeyRows(rng: np.random.Generator, numRows: int, length: int):
+    # Runs of constant brightness with occasional single-pixel noise, like a
+    # row across piano keys
+    runLengths = rng.integers(1, 12, size=(numRows, length))
+    runLevels = rng.choice(levels, size=(numRows, length))
+    rows = np.empty((numRows, length), dtype=np.int16)
+    for row, lengths, values in zip(rows, runLengths, runLevels):
+        row[:] = np.repeat(values, lengths)[:length]
+    noise = rng.random((numRows, length)) < 0.05
+    rows[noise] = rng.choice(levels, size=int(noise.sum()))
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_findKeyBoundariesMatchesLoop(seed):
+    rng = np.random.default_rng(seed)
+    rows = randomKeyRows(rng, 5000, 120)
+    for row, threshold in zip(rows, rng.choice(thresholds, size=len(rows))):
+        # Short rows cover the window edge cases
+        row = row[: rng.integers(0, 121)]
+        assert findKeyBoundaries(row, int(threshold)) == findKeyBoundariesLoop(
+            row.tolist(), int(threshold)
+        )
+
+
+def test_findKeyBoundariesTies():
+    # Windows exactly at the threshold flip the state each time
+    row = np.array([0, 0, 0, 25, 25, 25, 0, 0, 0, 25, 50, 50, 50], dtype=np.int16)
+    for threshold in (24, 25, 26):
+        assert findKeyBoundaries(row, threshold) == findKeyBoundariesLoop(
+            row.tolist(), threshold
+        )
+
+
+def test_countSettledRunsMatchesLoop():
+    rng = np.random.default_rng(42)
+    rows = randomKeyRows(rng, 2000, 120)
+    keyCounts = countSettledRuns(rows, thresholds)
+    windows = np.lib.stride_tricks.sliding_window_view(rows, 3, axis=1)
+    maxDiff = windows.max(axis=2) - windows.min(axis=2)
+    numCompared = 0
+    for rowIndex, row in enumerate(rows):
+        for thresholdIndex, threshold in enumerate(thresholds):
+            # countSettledRuns ignores the tie rule, so it only has to agree
+            # where no window is exactly at the threshold
+            if (maxDiff[rowIndex] == threshold).any():
+                continue
+            expected = len(findKeyBoundariesLoop(row.tolist(), int(threshold)))
+            assert keyCounts[rowIndex, thresholdIndex] == expected
+            numCompared += 1
+    assert numCompared > len(rows)
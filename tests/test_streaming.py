@@ -0,0 +1,72 @@
+# Streaming transcription produces the same notes as the full in-memory path.
+# Run from the project root: python -m pytest tests
+
+from dataclasses import replace
+
+import numpy as np
+
+from data_types import AdvancedOptions, KeyLabels, PianoKey
+from frame_sources import OpenCvFrameSource
+from key_timeline import KeyTimelineBuilder, decodeKeyTimeline, encodeKeyTimeline
+from vision import (
+    decodeKeySamples,
+    determineKeyPressesGMM,
+    streamKeyPresses,
+    transcribeVideo,
+)
+
+from tests.conftest import keyLocations
+
+
+def test_timelineBuilderMatchesWholeLabels():
+    rng = np.random.default_rng(0)
+    keys = list(PianoKey)
+    labels = rng.choice(4, size=(400, len(keys)), p=[0.9, 0.05, 0.03, 0.02])
+    labels = np.repeat(labels.astype(np.int8), rng.integers(1, 6, size=400), axis=0)
+    expected = encodeKeyTimeline(KeyLabels(labels, keys, 30))
+    # Batch boundaries split runs, including ones a single frame long
+    timelineBuilder = KeyTimelineBuilder()
+    bounds = [0, 1, 2, 250, 250, 700, len(labels)]
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        timelineBuilder.add(KeyLabels(labels[low:high], keys, 30 + low))
+    timeline = timelineBuilder.finish()
+    assert (timeline.numFrames, timeline.startFrame) == (len(labels), 30)
+    np.testing.assert_array_equal(timeline.keyOffsets, expected.keyOffsets)
+    np.testing.assert_array_equal(timeline.runStarts, expected.runStarts)
+    np.testing.assert_array_equal(timeline.runStates, expected.runStates)
+    np.testing.assert_array_equal(decodeKeyTimeline(timeline).labels, labels)
+
+
+def test_streamedBatchesMatchFullLabels(videoPath):
+    options = AdvancedOptions(useKeyCache=False)
+    expected = determineKeyPressesGMM(
+        decodeKeySamples(videoPath, keyLocations(), options), advancedOptions=options
+    )
+    timelineBuilder = KeyTimelineBuilder()
+    with OpenCvFrameSource(videoPath) as video:
+        # The first four batches wait for the model, the last is labeled as it
+        # arrives. Fewer warmup frames fit a slightly different model.
+        for keyLabels in streamKeyPresses(
+            video, keyLocations(), options, batchSize=50, warmupFrames=200
+        ):
+            timelineBuilder.add(keyLabels)
+    labels = decodeKeyTimeline(timelineBuilder.finish()).labels
+    np.testing.assert_array_equal(labels, expected.labels)
+
+
+def test_streamingMatchesFullTranscription(videoPath, tmp_path):
+    options = AdvancedOptions(useKeyCache=False)
+    outputPath = str(tmp_path / "out.mid")
+    full = transcribeVideo(videoPath, keyLocations(), options, outputPath)
+    streamed = transcribeVideo(
+        videoPath,
+        keyLocations(),
+        replace(options, streamTranscription=True),
+        outputPath,
+    )
+    assert sum(handNotes.numNotes for handNotes in full) > 0
+    for fullNotes, streamedNotes in zip(full, streamed):
+        assert fullNotes.hand == streamedNotes.hand
+        np.testing.assert_array_equal(fullNotes.pianoKeys, streamedNotes.pianoKeys)
+        np.testing.assert_allclose(fullNotes.startTimes, streamedNotes.startTimes)
+        np.testing.assert_allclose(fullNotes.endTimes, streamedNotes.endTimes)
@@ -0,0 +1,70 @@
+import time
+from PyQt5.QtCore import QObject, pyqtSignal
+from data_types import AdvancedOptions
+import vision
+
+
+class TranscriptionWorker(QObject):
+    # framesDone, totalFrames, frames per second, estimated seconds remaining
+    progress = pyqtSignal(int, int, float, float)
+    finished = pyqtSignal(list)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(
+        self,
+        videoPath: str,
+        keyLocations: list[tuple[int, int]],
+        advancedOptions: AdvancedOptions,
+        outputPath: str,
+        progressInterval: float = 0.1,
+    ):
+        super().__init__()
+        self.videoPath = videoPath
+        self.keyLocations = keyLocations
+        self.advancedOptions = advancedOptions
+        self.outputPath = outputPath
+        # Throttle progress signals so the GUI thread is not flooded
+        self.progressInterval = progressInterval
+        self.startTime = 0.0
+        self.lastReportTime = 0.0
+        self.scanProgress = vision.ScanProgress(self.reportProgress)
+
+    def run(self):
+        self.startTime = time.perf_counter()
+        try:
+            hands = vision.transcribeVideo(
+                self.videoPath,
+                self.keyLocations,
+                self.advancedOptions,
+                self.outputPath,
+                progress=self.scanProgress,
+            )
+        except vision.TranscriptionCancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit(hands)
+
+    def cancel(self):
+        # Called from the GUI thread; the scan checks the flag between frames
+        self.scanProgress.cancel()
+
+    def reportProgress(self, framesDone: int, totalFrames: int):
+        now = time.perf_counter()
+        if (
+            now - self.lastReportTime < self.progressInterval
+            and framesDone < totalFrames
+        ):
+            return
+        self.lastReportTime = now
+        elapsed = now - self.startTime
+        framesPerSecond = framesDone / elapsed if elapsed > 0 else 0.0
+        remainingSeconds = (
+            max(totalFrames - framesDone, 0) / framesPerSecond
+            if framesPerSecond > 0
+            else 0.0
+        )
+        self.progress.emit(framesDone, totalFrames, framesPerSecond, remainingSeconds)
@@ -44,6 +44,93 @@ class Ui_AdvancedOptions(object):
         self.keyDifferenceThresholdLabel = QtWidgets.QLabel(AdvancedOptions)
         self.keyDifferenceThresholdLabel.setObjectName("keyDifferenceThresholdLabel")
         self.gridLayout.addWidget(self.keyDifferenceThresholdLabel, 1, 0, 1, 1)
+        self.numWorkersLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.numWorkersLabel.setObjectName("numWorkersLabel")
+        self.gridLayout.addWidget(self.numWorkersLabel, 2, 0, 1, 1)
+        self.numWorkersSpinBox = QtWidgets.QSpinBox(AdvancedOptions)
+        self.numWorkersSpinBox.setMinimum(1)
+        self.numWorkersSpinBox.setMaximum(64)
+        self.numWorkersSpinBox.setObjectName("numWorkersSpinBox")
+        self.gridLayout.addWidget(self.numWorkersSpinBox, 2, 1, 1, 1)
+        self.useKeyCacheCheckBox = QtWidgets.QCheckBox(AdvancedOptions)
+        self.useKeyCacheCheckBox.setObjectName("useKeyCacheCheckBox")
+        self.gridLayout.addWidget(self.useKeyCacheCheckBox, 3, 0, 1, 2)
+        self.profileRunCheckBox = QtWidgets.QCheckBox(AdvancedOptions)
+        self.profileRunCheckBox.setObjectName("profileRunCheckBox")
+        self.gridLayout.addWidget(self.profileRunCheckBox, 4, 0, 1, 2)
+        self.autoCalibrateCheckBox = QtWidgets.QCheckBox(AdvancedOptions)
+        self.autoCalibrateCheckBox.setObjectName("autoCalibrateCheckBox")
+        self.gridLayout.addWidget(self.autoCalibrateCheckBox, 5, 0, 1, 2)
+        self.patchWidthLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.patchWidthLabel.setObjectName("patchWidthLabel")
+        self.gridLayout.addWidget(self.patchWidthLabel, 6, 0, 1, 1)
+        self.patchWidthSpinBox = QtWidgets.QSpinBox(AdvancedOptions)
+        self.patchWidthSpinBox.setMinimum(1)
+        self.patchWidthSpinBox.setMaximum(15)
+        self.patchWidthSpinBox.setObjectName("patchWidthSpinBox")
+        self.gridLayout.addWidget(self.patchWidthSpinBox, 6, 1, 1, 1)
+        self.patchHeightLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.patchHeightLabel.setObjectName("patchHeightLabel")
+        self.gridLayout.addWidget(self.patchHeightLabel, 7, 0, 1, 1)
+        self.patchHeightSpinBox = QtWidgets.QSpinBox(AdvancedOptions)
+        self.patchHeightSpinBox.setMinimum(1)
+        self.patchHeightSpinBox.setMaximum(15)
+        self.patchHeightSpinBox.setObjectName("patchHeightSpinBox")
+        self.gridLayout.addWidget(self.patchHeightSpinBox, 7, 1, 1, 1)
+        self.patchReductionLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.patchReductionLabel.setObjectName("patchReductionLabel")
+        self.gridLayout.addWidget(self.patchReductionLabel, 8, 0, 1, 1)
+        self.patchReductionComboBox = QtWidgets.QComboBox(AdvancedOptions)
+        self.patchReductionComboBox.setObjectName("patchReductionComboBox")
+        self.gridLayout.addWidget(self.patchReductionComboBox, 8, 1, 1, 1)
+        self.decodeBackendLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.decodeBackendLabel.setObjectName("decodeBackendLabel")
+        self.gridLayout.addWidget(self.decodeBackendLabel, 9, 0, 1, 1)
+        self.decodeBackendComboBox = QtWidgets.QComboBox(AdvancedOptions)
+        self.decodeBackendComboBox.setObjectName("decodeBackendComboBox")
+        self.gridLayout.addWidget(self.decodeBackendComboBox, 9, 1, 1, 1)
+        self.samplerThreadsLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.samplerThreadsLabel.setObjectName("samplerThreadsLabel")
+        self.gridLayout.addWidget(self.samplerThreadsLabel, 10, 0, 1, 1)
+        self.samplerThreadsSpinBox = QtWidgets.QSpinBox(AdvancedOptions)
+        self.samplerThreadsSpinBox.setMinimum(0)
+        self.samplerThreadsSpinBox.setMaximum(16)
+        self.samplerThreadsSpinBox.setObjectName("samplerThreadsSpinBox")
+        self.gridLayout.addWidget(self.samplerThreadsSpinBox, 10, 1, 1, 1)
+        self.colorProfileLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.colorProfileLabel.setObjectName("colorProfileLabel")
+        self.gridLayout.addWidget(self.colorProfileLabel, 11, 0, 1, 1)
+        self.colorProfileLineEdit = QtWidgets.QLineEdit(AdvancedOptions)
+        self.colorProfileLineEdit.setObjectName("colorProfileLineEdit")
+        self.gridLayout.addWidget(self.colorProfileLineEdit, 11, 1, 1, 1)
+        self.colorComponentsLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.colorComponentsLabel.setObjectName("colorComponentsLabel")
+        self.gridLayout.addWidget(self.colorComponentsLabel, 12, 0, 1, 1)
+        self.colorComponentsSpinBox = QtWidgets.QSpinBox(AdvancedOptions)
+        self.colorComponentsSpinBox.setMinimum(0)
+        self.colorComponentsSpinBox.setMaximum(12)
+        self.colorComponentsSpinBox.setObjectName("colorComponentsSpinBox")
+        self.gridLayout.addWidget(self.colorComponentsSpinBox, 12, 1, 1, 1)
+        self.skipStaticFramesCheckBox = QtWidgets.QCheckBox(AdvancedOptions)
+        self.skipStaticFramesCheckBox.setObjectName("skipStaticFramesCheckBox")
+        self.gridLayout.addWidget(self.skipStaticFramesCheckBox, 13, 0, 1, 2)
+        self.staticFrameToleranceLabel = QtWidgets.QLabel(AdvancedOptions)
+        self.staticFrameToleranceLabel.setObjectName("staticFrameToleranceLabel")
+        self.gridLayout.addWidget(self.staticFrameToleranceLabel, 14, 0, 1, 1)
+        self.staticFrameToleranceSpinBox = QtWidgets.QSpinBox(AdvancedOptions)
+        self.staticFrameToleranceSpinBox.setMinimum(0)
+        self.staticFrameToleranceSpinBox.setMaximum(64)
+        self.staticFrameToleranceSpinBox.setObjectName("staticFrameToleranceSpinBox")
+        self.gridLayout.addWidget(self.staticFrameToleranceSpinBox, 14, 1, 1, 1)
+        self.autoTrimCheckBox = QtWidgets.QCheckBox(AdvancedOptions)
+        self.autoTrimCheckBox.setObjectName("autoTrimCheckBox")
+        self.gridLayout.addWidget(self.autoTrimCheckBox, 15, 0, 1, 2)
+        self.writeTimingsCheckBox = QtWidgets.QCheckBox(AdvancedOptions)
+        self.writeTimingsCheckBox.setObjectName("writeTimingsCheckBox")
+        self.gridLayout.addWidget(self.writeTimingsCheckBox, 16, 0, 1, 2)
+        self.streamTranscriptionCheckBox = QtWidgets.QCheckBox(AdvancedOptions)
+        self.streamTranscriptionCheckBox.setObjectName("streamTranscriptionCheckBox")
+        self.gridLayout.addWidget(self.streamTranscriptionCheckBox, 17, 0, 1, 2)
         self.verticalLayout_3.addLayout(self.gridLayout)
         self.gridLayout_2 = QtWidgets.QGridLayout()
         self.gridLayout_2.setObjectName("gridLayout_2")
@@ -76,4 +163,20 @@ class Ui_AdvancedOptions(object):
         AdvancedOptions.setWindowTitle(_translate("AdvancedOptions", "Advanced Options"))
         self.keyOffsetLabel.setText(_translate("AdvancedOptions", "Key Read Offset [% from bottom]"))
         self.keyDifferenceThresholdLabel.setText(_translate("AdvancedOptions", "Key Difference Threshold"))
+        self.numWorkersLabel.setText(_translate("AdvancedOptions", "Scanning Worker Processes"))
+        self.useKeyCacheCheckBox.setText(_translate("AdvancedOptions", "Cache Sampled Keys Between Runs"))
+        self.profileRunCheckBox.setText(_translate("AdvancedOptions", "Profile Transcription (cProfile + tracemalloc)"))
+        self.autoCalibrateCheckBox.setText(_translate("AdvancedOptions", "Auto-Calibrate Key Detection"))
+        self.patchWidthLabel.setText(_translate("AdvancedOptions", "Key Sample Patch Width"))
+        self.patchHeightLabel.setText(_translate("AdvancedOptions", "Key Sample Patch Height"))
+        self.patchReductionLabel.setText(_translate("AdvancedOptions", "Key Sample Patch Reduction"))
+        self.decodeBackendLabel.setText(_translate("AdvancedOptions", "Decode Backend"))
+        self.samplerThreadsLabel.setText(_translate("AdvancedOptions", "Key Sampling Threads (0 = Inline)"))
+        self.colorProfileLabel.setText(_translate("AdvancedOptions", "Color Profile (Blank = Fit Every Video)"))
+        self.colorComponentsLabel.setText(_translate("AdvancedOptions", "Color Clusters (0 = Auto)"))
+        self.skipStaticFramesCheckBox.setText(_translate("AdvancedOptions", "Store Unchanged Frames as Repeats"))
+        self.staticFrameToleranceLabel.setText(_translate("AdvancedOptions", "Unchanged Frame Tolerance"))
+        self.autoTrimCheckBox.setText(_translate("AdvancedOptions", "Trim Intro/Outro Without Keyboard"))
+        self.writeTimingsCheckBox.setText(_translate("AdvancedOptions", "Write Stage Timings (.timings.json)"))
+        self.streamTranscriptionCheckBox.setText(_translate("AdvancedOptions", "Stream Transcription (Constant Memory, No Cache)"))
         self.startingKeyNoteLabel.setText(_translate("AdvancedOptions", "Starting Key / Note"))
@@ -52,6 +52,17 @@ class Ui_MainWindow(object):
         self.logOutput.setObjectName("logOutput")
         self.videoLogRow.addWidget(self.logOutput)
         self.mainVerticalLayout.addLayout(self.videoLogRow)
+        self.scrubberRow = QtWidgets.QHBoxLayout()
+        self.scrubberRow.setObjectName("scrubberRow")
+        self.frameSlider = QtWidgets.QSlider(self.centralwidget)
+        self.frameSlider.setEnabled(False)
+        self.frameSlider.setOrientation(QtCore.Qt.Horizontal)
+        self.frameSlider.setObjectName("frameSlider")
+        self.scrubberRow.addWidget(self.frameSlider)
+        self.frameLabel = QtWidgets.QLabel(self.centralwidget)
+        self.frameLabel.setObjectName("frameLabel")
+        self.scrubberRow.addWidget(self.frameLabel)
+        self.mainVerticalLayout.addLayout(self.scrubberRow)
         self.buttonRow = QtWidgets.QHBoxLayout()
         self.buttonRow.setObjectName("buttonRow")
         self.previewKeysButton = QtWidgets.QPushButton(self.centralwidget)
@@ -66,6 +77,17 @@ class Ui_MainWindow(object):
         self.transcribeVideoButton.setEnabled(False)
         self.transcribeVideoButton.setObjectName("transcribeVideoButton")
         self.mainVerticalLayout.addWidget(self.transcribeVideoButton)
+        self.progressRow = QtWidgets.QHBoxLayout()
+        self.progressRow.setObjectName("progressRow")
+        self.transcriptionProgressBar = QtWidgets.QProgressBar(self.centralwidget)
+        self.transcriptionProgressBar.setProperty("value", 0)
+        self.transcriptionProgressBar.setObjectName("transcriptionProgressBar")
+        self.progressRow.addWidget(self.transcriptionProgressBar)
+        self.cancelTranscriptionButton = QtWidgets.QPushButton(self.centralwidget)
+        self.cancelTranscriptionButton.setEnabled(False)
+        self.cancelTranscriptionButton.setObjectName("cancelTranscriptionButton")
+        self.progressRow.addWidget(self.cancelTranscriptionButton)
+        self.mainVerticalLayout.addLayout(self.progressRow)
         MainWindow.setCentralWidget(self.centralwidget)
 
         self.retranslateUi(MainWindow)
@@ -77,6 +99,9 @@ class Ui_MainWindow(object):
         self.fileBrowseButton.setText(_translate("MainWindow", "Browse"))
         self.videoLabel.setText(_translate("MainWindow", "Select Video File to Preview"))
         self.logOutput.setPlainText(_translate("MainWindow", "Log output will appear here…"))
+        self.frameLabel.setText(_translate("MainWindow", "Frame 0 / 0"))
         self.previewKeysButton.setText(_translate("MainWindow", "Preview Key Locations"))
         self.advancedOptionsButton.setText(_translate("MainWindow", "Advanced Options"))
         self.transcribeVideoButton.setText(_translate("MainWindow", "Transcribe Video"))
+        self.transcriptionProgressBar.setFormat(_translate("MainWindow", "Idle"))
+        self.cancelTranscriptionButton.setText(_translate("MainWindow", "Cancel"))
@@ -1,101 +1,1061 @@
 import cv2
-from data_types import AdvancedOptions, PianoKey, Notation
-from matplotlib import pyplot as plt
-from sklearn.cluster import KMeans
-from sklearn.cluster import DBSCAN
-from sklearn.mixture import GaussianMixture
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Callable, Iterator, TYPE_CHECKING
+from data_types import (
+    AdvancedOptions,
+    PianoKey,
+    Notation,
+    KeySamples,
+    KeyLabels,
+    HandNotes,
+    KeyTimeline,
+    PatchReduction,
+    DecodeBackend,
+)
+from midi_export import writeMidiFile
+from key_cache import KeyCache, keySamplesCacheKey
+from key_timeline import (
+    KeyTimelineBuilder,
+    activeNotes,
+    encodeKeyTimeline,
+    saveKeyTimeline,
+)
+from color_profiles import (
+    ColorProfile,
+    colorProfilePath,
+    loadColorProfile,
+    saveColorProfile,
+)
+from frame_sources import FrameSource, openFrameSource
+from scan_pipeline import SamplingPipeline
+from profiling import profiler, profiledRun, writeTimingsReport
 import numpy as np
-import pandas as pd
 from app_logging import logger, LogLevel
 
+# Plotting, pandas and sklearn are slow to import and only needed by some
+# stages, so they are imported where they are used
+if TYPE_CHECKING:
+    from sklearn.mixture import GaussianMixture
+
+
+class TranscriptionCancelled(Exception):
+    pass
+
+
+class ScanProgress:
+    # Shared between the scanning code and whoever started it, e.g. a GUI worker
+    def __init__(self, callback: Callable[[int, int], None] | None = None):
+        self.callback = callback
+        self.framesDone = 0
+        self.totalFrames = 0
+        self.cancelEvent = threading.Event()
+
+    def cancel(self):
+        self.cancelEvent.set()
+
+    def checkCancelled(self):
+        if self.cancelEvent.is_set():
+            raise TranscriptionCancelled()
+
+    def advance(self, numFrames: int):
+        self.framesDone += numFrames
+        self.checkCancelled()
+        if self.callback:
+            self.callback(self.framesDone, self.totalFrames)
+
+
+def keyRowIndex(frameHeight: int, keyOffset: int) -> int:
+    # Clamp so a 0% offset reads the bottom row instead of running off the frame
+    return min(frameHeight - int(frameHeight * keyOffset / 100), frameHeight - 1)
+
+
+def findKeyBoundaries(
+    keySlice: np.ndarray, keyDifferenceThreshold: int, windowSize: int = 3
+) -> list[tuple[int, int]]:
+    if len(keySlice) < windowSize:
+        return [(0, len(keySlice) - 1)]
+    # Range (max - min) of every sliding window along the row
+    windows = np.lib.stride_tricks.sliding_window_view(keySlice, windowSize)
+    maxDiff = windows.max(axis=1) - windows.min(axis=1)
+    # A window above the threshold ends a settled run, one below starts it.
+    # A window exactly at the threshold flips the current state.
+    isSettledAfter = maxDiff < keyDifferenceThreshold
+    isAtThreshold = maxDiff == keyDifferenceThreshold
+    indices = np.arange(len(maxDiff))
+    lastDecided = np.maximum.accumulate(np.where(isAtThreshold, -1, indices))
+    decidedState = np.where(
+        lastDecided >= 0, isSettledAfter[np.maximum(lastDecided, 0)], False
+    )
+    isSettledAfter = decidedState ^ ((indices - lastDecided) % 2 == 1)
+    isSettledBefore = np.concatenate(([False], isSettledAfter[:-1]))
+    # State changes alternate between settling and leaving a key, starting settled
+    changes = np.flatnonzero(isSettledAfter != isSettledBefore)
+    settles = changes[0::2]
+    edges = changes[1::2]
+    keyBoundaries = list(zip(settles[: len(edges)].tolist(), (edges + 1).tolist()))
+    leftEdge = int(changes[-1]) if len(changes) else 0
+    keyBoundaries.append((leftEdge, len(keySlice) - 1))
+    return keyBoundaries
+
 
 def determineKeyLocations(
     frame: cv2.typing.MatLike, advancedOptions: AdvancedOptions
 ) -> list[tuple[int, int]]:
-    frame = cv2.cvtColor(frame.copy(), cv2.COLOR_BGR2HSV)
-    keySlice = [
-        int(pixel[2])
-        for pixel in frame[
-            frame.shape[0] - int(frame.shape[0] * advancedOptions.keyOffset / 100)
-        ]
-    ]
-    keyBoundaries = []
-    leftEdge = 0
-    i = 0
-    windowSize = 3
-    isSettled = False
-    while i < len(keySlice) - windowSize + 1:
-        window = keySlice[i : i + windowSize]
-        maxDiff = max(window) - min(window)
-        # If there is a big jump in value, assume edge of key
-        if maxDiff >= advancedOptions.keyDifferenceThreshold and isSettled:
-            keyBoundaries.append((leftEdge, i + 1))
-            leftEdge = i
-            isSettled = False
-        elif maxDiff <= advancedOptions.keyDifferenceThreshold and not isSettled:
-            isSettled = True
-            leftEdge = i
-        i += 1
-    keyBoundaries.append((leftEdge, len(keySlice) - 1))
+    keyRow = keyRowIndex(frame.shape[0], advancedOptions.keyOffset)
+    # Only the sampled row is needed, so convert just that row
+    rowHsv = cv2.cvtColor(frame[keyRow : keyRow + 1], cv2.COLOR_BGR2HSV)
+    keySlice = rowHsv[0, :, 2].astype(np.int16)
+    keyBoundaries = findKeyBoundaries(keySlice, advancedOptions.keyDifferenceThreshold)
     keyLocations = [
-        (
-            (keyBoundary[1] + keyBoundary[0]) // 2,
-            frame.shape[0] - int(frame.shape[0] * advancedOptions.keyOffset / 100),
-        )
+        ((keyBoundary[1] + keyBoundary[0]) // 2, keyRow)
         for keyBoundary in keyBoundaries
     ]
     return keyLocations
 
 
-def readKeys(
+# Offsets of the black keys within each octave of PianoKey values (A0 = 0)
+blackKeyPattern = np.isin(np.arange(len(PianoKey)) % 12, [1, 4, 6, 9, 11])
+standardKeyboardSizes = (88, 76, 73, 61, 49, 37, 25)
+minLayoutContrast = 50
+
+
+@dataclass
+class KeyCalibration:
+    keyOffset: int
+    keyDifferenceThreshold: int
+    startingKey: PianoKey
+    numKeys: int
+    score: float
+
+
+def countSettledRuns(
+    rows: np.ndarray, thresholds: np.ndarray, windowSize: int = 3
+) -> np.ndarray:
+    # Number of keys findKeyBoundaries would report for every (row, threshold)
+    # pair at once, ignoring the tie rule for windows exactly at a threshold
+    windows = np.lib.stride_tricks.sliding_window_view(rows, windowSize, axis=1)
+    maxDiff = windows.max(axis=2) - windows.min(axis=2)
+    isSettled = maxDiff[:, np.newaxis, :] < thresholds[np.newaxis, :, np.newaxis]
+    numChanges = (isSettled[..., 1:] != isSettled[..., :-1]).sum(axis=2)
+    numChanges += isSettled[..., 0]
+    return numChanges // 2 + 1
+
+
+def matchKeyboardLayout(keyValues: np.ndarray) -> tuple[int, float] | None:
+    # Finds the starting key whose black/white layout best matches the
+    # brightness of the detected key centers. Returns (start, mismatch rate).
+    numKeys = len(keyValues)
+    low, high = np.percentile(keyValues, [10, 90])
+    if high - low < minLayoutContrast:
+        return None
+    isBlack = keyValues < (low + high) / 2
+    layouts = np.lib.stride_tricks.sliding_window_view(blackKeyPattern, numKeys)
+    mismatches = (layouts != isBlack).mean(axis=1)
+    # Prefer keyboards ending on the top key, which the key mapping assumes
+    preference = np.abs(np.arange(len(layouts)) - (len(PianoKey) - numKeys))
+    start = int(np.lexsort((preference, mismatches))[0])
+    return start, float(mismatches[start])
+
+
+def calibrateKeyDetection(
+    frames: list[cv2.typing.MatLike],
+    keyOffsets: range = range(1, 51),
+    thresholds: range = range(5, 125, 5),
+    minKeys: int = 24,
+) -> KeyCalibration | None:
+    height = frames[0].shape[0]
+    offsets = np.array(keyOffsets)
+    thresholdValues = np.array(thresholds)
+    rowIndices = np.array([keyRowIndex(height, offset) for offset in offsets])
+    # HSV value is the channel maximum, and the median over frames hides
+    # falling notes and pressed-key colors
+    rows = np.stack([frame[rowIndices].max(axis=2) for frame in frames])
+    rows = np.median(rows, axis=0).astype(np.int16)
+    keyCounts = countSettledRuns(rows, thresholdValues)
+
+    candidates = []
+    # One extra run is allowed for the sliver findKeyBoundaries ends a row with
+    isPlausible = (keyCounts >= minKeys) & (keyCounts <= len(PianoKey) + 1)
+    for rowIndex in np.flatnonzero(isPlausible.any(axis=1)):
+        # Neighboring thresholds with the same key count almost always find the
+        # same keys, so only the middle threshold of each such run is scored
+        runStarts = np.flatnonzero(np.diff(keyCounts[rowIndex], prepend=-1))
+        runEnds = np.append(runStarts[1:], len(thresholdValues))
+        for runStart, runEnd in zip(runStarts, runEnds):
+            if not isPlausible[rowIndex, runStart]:
+                continue
+            threshold = int(thresholdValues[(runStart + runEnd - 1) // 2])
+            keyBoundaries = np.array(findKeyBoundaries(rows[rowIndex], threshold))
+            widths = keyBoundaries[:, 1] - keyBoundaries[:, 0]
+            if widths[-1] < np.median(widths) / 2:
+                keyBoundaries = keyBoundaries[:-1]
+            if not minKeys <= len(keyBoundaries) <= len(PianoKey):
+                continue
+            centers = keyBoundaries.sum(axis=1) // 2
+            spacing = np.diff(centers)
+            medianSpacing = max(np.median(spacing), 1)
+            irregularity = np.median(np.abs(spacing - medianSpacing)) / medianSpacing
+            layout = matchKeyboardLayout(rows[rowIndex][centers])
+            if layout is None:
+                continue
+            start, mismatch = layout
+            countPenalty = 0.0 if len(centers) in standardKeyboardSizes else 0.1
+            score = float(mismatch + irregularity + countPenalty)
+            candidates.append(
+                (score, len(centers), start, int(offsets[rowIndex]), threshold)
+            )
+    if not candidates:
+        return None
+
+    # Many settings give the same best result; take the middle of that plateau
+    # so small changes in the video do not push detection off the edge
+    bestScore, numKeys, start, _, _ = min(candidates)
+    plateau = [
+        candidate
+        for candidate in candidates
+        if candidate[1:3] == (numKeys, start) and candidate[0] <= bestScore + 0.01
+    ]
+    plateau.sort(key=lambda candidate: candidate[3])
+    _, _, _, keyOffset, keyDifferenceThreshold = plateau[len(plateau) // 2]
+    return KeyCalibration(
+        keyOffset, keyDifferenceThreshold, PianoKey(start), numKeys, bestScore
+    )
+
+
+def sampleCalibrationFrames(
+    video: cv2.VideoCapture, startFrame: int = 0, numFrames: int = 5
+) -> list[cv2.typing.MatLike]:
+    totalFrames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    frameIndices = np.linspace(
+        startFrame, max(totalFrames - 1, startFrame), numFrames, dtype=int
+    )
+    frames = []
+    for frameIndex in np.unique(frameIndices):
+        video.set(cv2.CAP_PROP_POS_FRAMES, int(frameIndex))
+        ret, frame = video.read()
+        if ret:
+            frames.append(frame)
+    return frames
+
+
+def applyCalibration(
+    advancedOptions: AdvancedOptions, calibration: KeyCalibration
+) -> AdvancedOptions:
+    logger.sendLog(
+        f"Calibrated key detection: key offset {calibration.keyOffset}, difference threshold {calibration.keyDifferenceThreshold}, {calibration.numKeys} keys starting at {calibration.startingKey.name}.",
+        LogLevel.INFO,
+    )
+    return replace(
+        advancedOptions,
+        keyOffset=calibration.keyOffset,
+        keyDifferenceThreshold=calibration.keyDifferenceThreshold,
+        startingKey=calibration.startingKey,
+    )
+
+
+class KeySampler:
+    # Gathers a patch of pixels around every key with one take per frame.
+    # Indices into the flattened frame are built once per frame layout, with
+    # each key channel's patch contiguous so the reduction is a fast row sum,
+    # and patches are reduced in BGR so only one color per key goes to HSV.
+    def __init__(
+        self,
+        keyRows: np.ndarray,
+        keyColumns: np.ndarray,
+        patchWidth: int = 1,
+        patchHeight: int = 1,
+        reduction: PatchReduction = PatchReduction.Mean,
+    ):
+        self.keyRows = keyRows
+        self.keyColumns = keyColumns
+        self.patchWidth = max(patchWidth, 1)
+        self.patchHeight = max(patchHeight, 1)
+        self.reduction = reduction
+        # Frame size and the position of its top-left pixel in the video,
+        # which is not (0, 0) for frame sources that crop
+        self.frameLayout: tuple[int, int, int, int] | None = None
+        self.gatherIndices = np.empty((0, self.patchSize), dtype=np.intp)
+
+    @property
+    def numKeys(self) -> int:
+        return len(self.keyRows)
+
+    @property
+    def patchSize(self) -> int:
+        return self.patchWidth * self.patchHeight
+
+    def prepare(self, frameLayout: tuple[int, int, int, int]):
+        height, width, originX, originY = frameLayout
+        rowOffsets = np.arange(self.patchHeight) - self.patchHeight // 2
+        columnOffsets = np.arange(self.patchWidth) - self.patchWidth // 2
+        # Patches are clipped to the frame, repeating edge pixels
+        rows = np.clip(
+            self.keyRows[:, np.newaxis] - originY + rowOffsets, 0, height - 1
+        )
+        columns = np.clip(
+            self.keyColumns[:, np.newaxis] - originX + columnOffsets, 0, width - 1
+        )
+        pixelIndices = rows[:, :, np.newaxis] * width + columns[:, np.newaxis, :]
+        pixelIndices = pixelIndices.reshape(self.numKeys, 1, self.patchSize)
+        # Shape (keys * 3, patchSize): one row per key and BGR channel
+        channelIndices = pixelIndices * 3 + np.arange(3)[np.newaxis, :, np.newaxis]
+        self.gatherIndices = channelIndices.reshape(-1, self.patchSize)
+        self.frameLayout = frameLayout
+
+    def sample(
+        self, frame: cv2.typing.MatLike, origin: tuple[int, int] = (0, 0)
+    ) -> np.ndarray:
+        frameLayout = (*frame.shape[:2], *origin)
+        if frameLayout != self.frameLayout:
+            self.prepare(frameLayout)
+        channelValues = frame.reshape(-1).take(self.gatherIndices)
+        if self.patchSize == 1:
+            keyPixels = channelValues[:, 0]
+        elif self.reduction == PatchReduction.Median:
+            middle = self.patchSize // 2
+            keyPixels = np.partition(channelValues, middle, axis=1)[:, middle]
+        else:
+            patchSums = cv2.reduce(channelValues, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S)[
+                :, 0
+            ]
+            keyPixels = (patchSums + self.patchSize // 2) // self.patchSize
+        keyPixels = keyPixels.astype(np.uint8).reshape(1, self.numKeys, 3)
+        return cv2.cvtColor(keyPixels, cv2.COLOR_BGR2HSV)[0]
+
+
+def prepareKeySampling(
+    keyLocations: list[tuple[int, int]], advancedOptions: AdvancedOptions
+) -> tuple[list[PianoKey], KeySampler]:
+    pianoKeyRange = [
+        key for key in PianoKey if key.value >= advancedOptions.startingKey.value
+    ]
+    # Keys beyond the end of the piano are dropped, like zip() did before
+    sampledLocations = keyLocations[: len(pianoKeyRange)]
+    sampledKeys = pianoKeyRange[: len(sampledLocations)]
+    if len(keyLocations) != len(pianoKeyRange):
+        logger.sendLog(
+            "Number of detected keys is not equal to expected number of keys based on starting key, this may cause errors in transcription.",
+            LogLevel.WARN,
+        )
+    keyRows = np.array([y for _, y in sampledLocations], dtype=np.intp)
+    keyColumns = np.array([x for x, _ in sampledLocations], dtype=np.intp)
+    keySampler = KeySampler(
+        keyRows,
+        keyColumns,
+        advancedOptions.patchWidth,
+        advancedOptions.patchHeight,
+        advancedOptions.patchReduction,
+    )
+    return sampledKeys, keySampler
+
+
+def keyBandRect(
+    keyLocations: list[tuple[int, int]], advancedOptions: AdvancedOptions
+) -> tuple[int, int, int, int]:
+    # (x, y, width, height) covering every key patch, for cropping decoders
+    columns = [x for x, _ in keyLocations]
+    rows = [y for _, y in keyLocations]
+    left = min(columns) - advancedOptions.patchWidth // 2
+    top = min(rows) - advancedOptions.patchHeight // 2
+    right = max(columns) + (advancedOptions.patchWidth - 1) // 2 + 1
+    bottom = max(rows) + (advancedOptions.patchHeight - 1) // 2 + 1
+    return left, top, right - left, bottom - top
+
+
+def sampleFrames(
+    video: FrameSource,
+    keySampler: KeySampler,
+    maxFrames: int | None = None,
+    progress: ScanProgress | None = None,
+    progressInterval: int = 30,
+    numSamplers: int = 0,
+    staticTolerance: int | None = None,
+    shouldStop: Callable[[], bool] | None = None,
+) -> tuple[np.ndarray, np.ndarray | None]:
+    # Returns the sampled rows and, if staticTolerance is set, how many frames
+    # each row stands for. shouldStop is polled every progressInterval frames
+    # and ends the scan early when it returns True.
+    if numSamplers > 0:
+        pipeline = SamplingPipeline(video, keySampler, maxFrames, numSamplers)
+        samples = pipeline.run(progress, progressInterval)
+        if staticTolerance is None:
+            return samples, None
+        with profiler.stage("collapseStaticFrames", frames=len(samples)):
+            return collapseStaticFrames(samples, staticTolerance)
+    # Preallocate from the reported frame count and grow if it was an underestimate
+    capacity = maxFrames or video.numFrames
+    capacity = max(capacity, 1)
+    samples = np.empty((capacity, keySampler.numKeys, 3), dtype=np.uint8)
+    repeats = (
+        np.zeros(capacity, dtype=np.int64) if staticTolerance is not None else None
+    )
+    numRows = 0
+    numFrames = 0
+    # Timings are accumulated locally and recorded once to keep the loop cheap
+    decodeSeconds = 0.0
+    sampleSeconds = 0.0
+    frameBytes = 0
+    cropOrigin = video.cropRect[:2]
+    while maxFrames is None or numFrames < maxFrames:
+        decodeStart = time.perf_counter()
+        ret, frame = video.read()
+        sampleStart = time.perf_counter()
+        decodeSeconds += sampleStart - decodeStart
+        if not ret:
+            break
+        frameBytes = frame.nbytes
+        if numRows == capacity:
+            capacity *= 2
+            samples = np.resize(samples, (capacity, keySampler.numKeys, 3))
+            if repeats is not None:
+                repeats = np.resize(repeats, capacity)
+        samples[numRows] = keySampler.sample(frame, cropOrigin)
+        numFrames += 1
+        # An unchanged row is dropped by not advancing past it
+        if (
+            repeats is not None
+            and numRows
+            and isStaticRow(samples[numRows], samples[numRows - 1], staticTolerance)
+        ):
+            repeats[numRows - 1] += 1
+        else:
+            if repeats is not None:
+                repeats[numRows] = 1
+            numRows += 1
+        sampleSeconds += time.perf_counter() - sampleStart
+        if numFrames % progressInterval == 0:
+            if progress:
+                progress.advance(progressInterval)
+            if shouldStop and shouldStop():
+                break
+    profiler.record("decode", decodeSeconds, numFrames, frameBytes)
+    profiler.record("sampleKeys", sampleSeconds, numFrames, samples[:numRows].nbytes)
+    if progress:
+        progress.advance(numFrames % progressInterval)
+    return samples[:numRows], None if repeats is None else repeats[:numRows]
+
+
+def isStaticRow(row: np.ndarray, previousRow: np.ndarray, tolerance: int) -> bool:
+    return cv2.norm(row, previousRow, cv2.NORM_INF) <= tolerance
+
+
+def collapseStaticFrames(
+    samples: np.ndarray, tolerance: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # Same rule as the inline check in sampleFrames: each frame is compared with
+    # the last kept row, so collapsed frames never drift further than tolerance
+    keptRows = []
+    lastRow = None
+    for frameIndex, row in enumerate(samples):
+        if lastRow is None or not isStaticRow(row, lastRow, tolerance):
+            keptRows.append(frameIndex)
+            lastRow = row
+    keptRows = np.array(keptRows, dtype=np.int64)
+    repeats = np.diff(keptRows, append=len(samples))
+    return samples[keptRows], repeats
+
+
+def isKeyboardVisible(keyColors: np.ndarray, keys: list[PianoKey]) -> bool:
+    # A keyboard has bright white keys and dark black keys, which title cards,
+    # fades and blank frames lack
+    values = keyColors[:, 2].astype(float)
+    isBlack = blackKeyPattern[[key.value for key in keys]]
+    if isBlack.all() or not isBlack.any():
+        return False
+    contrast = np.median(values[~isBlack]) - np.median(values[isBlack])
+    return contrast >= minLayoutContrast
+
+
+def findPerformanceRange(
+    video: FrameSource,
+    keySampler: KeySampler,
+    keys: list[PianoKey],
+    numProbes: int = 9,
+) -> tuple[int, int]:
+    # Returns [start, end) frames with a visible keyboard, assuming it is
+    # hidden only during an intro and an outro. Each boundary is found by
+    # bisecting with seeks, so only a few dozen frames are decoded.
+    cropOrigin = video.cropRect[:2]
+
+    def visibleAt(frameIndex: int) -> bool:
+        video.seek(frameIndex)
+        ret, frame = video.read()
+        return ret and isKeyboardVisible(keySampler.sample(frame, cropOrigin), keys)
+
+    lastFrame = video.numFrames - 1
+    probes = np.unique(np.linspace(0, lastFrame, numProbes).astype(int))
+    visibleProbes = [int(probe) for probe in probes if visibleAt(int(probe))]
+    if not visibleProbes:
+        logger.sendLog(
+            "No keyboard found while trimming, scanning the whole video.",
+            LogLevel.WARN,
+        )
+        return 0, video.numFrames
+
+    # First visible frame lies in (low, high], last visible frame in [low, high)
+    low, high = -1, visibleProbes[0]
+    while high - low > 1:
+        middle = (low + high) // 2
+        low, high = (low, middle) if visibleAt(middle) else (middle, high)
+    startFrame = high
+    low, high = visibleProbes[-1], lastFrame + 1
+    while high - low > 1:
+        middle = (low + high) // 2
+        low, high = (middle, high) if visibleAt(middle) else (low, middle)
+    endFrame = high
+    logger.sendLog(
+        f"Trimmed to frames {startFrame}-{endFrame - 1} of {video.numFrames}.",
+        LogLevel.INFO,
+    )
+    return startFrame, endFrame
+
+
+def findKeyboardFrame(
     video: cv2.VideoCapture,
-    keyLocations: list[tuple[int, int]],
     advancedOptions: AdvancedOptions,
-    debug: bool = False,
-) -> pd.DataFrame:
-    data = []
-    video = video
-    while True:
+    firstFrame: int = 0,
+    numProbes: int = 9,
+    minKeys: int = 24,
+) -> tuple[int, cv2.typing.MatLike] | None:
+    # First of firstFrame and evenly spread later frames on which the detected
+    # keys look like a keyboard, for videos that may open on a title card
+    totalFrames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    probes = np.linspace(firstFrame, max(totalFrames - 1, firstFrame), numProbes)
+    for frameIndex in dict.fromkeys([firstFrame, *probes.astype(int).tolist()]):
+        video.set(cv2.CAP_PROP_POS_FRAMES, frameIndex)
         ret, frame = video.read()
         if not ret:
-            break
-        frame = cv2.cvtColor(frame.copy(), cv2.COLOR_BGR2HSV)
-        pianoKeyRange = [
-            key for key in PianoKey if key.value >= advancedOptions.startingKey.value
-        ]
-        if len(keyLocations) != len(pianoKeyRange):
+            continue
+        keyLocations = determineKeyLocations(frame, advancedOptions)
+        if len(keyLocations) < minKeys:
+            continue
+        sampledKeys, keySampler = prepareKeySampling(keyLocations, advancedOptions)
+        if isKeyboardVisible(keySampler.sample(frame), sampledKeys):
+            return frameIndex, frame
+    return None
+
+
+def staticTolerance(advancedOptions: AdvancedOptions) -> int | None:
+    if not advancedOptions.skipStaticFrames:
+        return None
+    return advancedOptions.staticFrameTolerance
+
+
+def seekPerformanceRange(
+    video: FrameSource,
+    keySampler: KeySampler,
+    keys: list[PianoKey],
+    progress: ScanProgress | None = None,
+) -> tuple[int, int]:
+    # Seeks to the start of the performance, returning where the decoder landed
+    # and how many frames are left to read
+    with profiler.stage("autoTrim"):
+        startFrame, endFrame = findPerformanceRange(video, keySampler, keys)
+    startFrame = video.seek(startFrame)
+    numFrames = max(endFrame - startFrame, 0)
+    if progress:
+        progress.totalFrames = numFrames
+    return startFrame, numFrames
+
+
+def readKeys(
+    video: FrameSource,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+) -> KeySamples:
+    sampledKeys, keySampler = prepareKeySampling(keyLocations, advancedOptions)
+    startFrame, numFrames = 0, None
+    if advancedOptions.autoTrim:
+        startFrame, numFrames = seekPerformanceRange(
+            video, keySampler, sampledKeys, progress
+        )
+    samples, repeats = sampleFrames(
+        video,
+        keySampler,
+        numFrames,
+        progress=progress,
+        numSamplers=advancedOptions.samplerThreads,
+        staticTolerance=staticTolerance(advancedOptions),
+    )
+    keySamples = KeySamples(samples, sampledKeys, repeats, startFrame)
+    if debug:
+        saveKeySamplesCsv(keySamples, "keys.csv")
+    return keySamples
+
+
+def scanChunk(
+    videoPath: str,
+    keySampler: KeySampler,
+    seekFrame: int,
+    numFrames: int | None,
+    decodeBackend: DecodeBackend = DecodeBackend.OpenCv,
+    cropRect: tuple[int, int, int, int] | None = None,
+    stopEvent: threading.Event | None = None,
+) -> tuple[int, np.ndarray]:
+    # Runs in a worker process, so it opens its own frame source
+    with openFrameSource(videoPath, decodeBackend, cropRect) as video:
+        # Report where the decoder actually landed, which can differ from the request
+        reportedStart = video.seek(seekFrame)
+        samples, _ = sampleFrames(
+            video,
+            keySampler,
+            numFrames,
+            shouldStop=stopEvent.is_set if stopEvent else None,
+        )
+    return reportedStart, samples
+
+
+def alignChunkStart(
+    previous: np.ndarray,
+    previousStart: int,
+    chunk: np.ndarray,
+    reportedStart: int,
+    maxShift: int,
+) -> int:
+    # Find the start frame at which the chunk's head best matches the previous tail
+    previousEnd = previousStart + len(previous)
+    bestStart = reportedStart
+    bestScore = None
+    for shift in sorted(range(-maxShift, maxShift + 1), key=abs):
+        candidateStart = reportedStart + shift
+        overlap = min(previousEnd - candidateStart, len(chunk))
+        if candidateStart < previousStart or overlap <= 0:
+            continue
+        offset = candidateStart - previousStart
+        score = np.abs(
+            previous[offset : offset + overlap].astype(np.int16)
+            - chunk[:overlap].astype(np.int16)
+        ).mean()
+        if bestScore is None or score < bestScore:
+            bestStart, bestScore = candidateStart, score
+    return bestStart
+
+
+def readKeysParallel(
+    videoPath: str,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    chunkOverlap: int = 16,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+) -> KeySamples:
+    sampledKeys, keySampler = prepareKeySampling(keyLocations, advancedOptions)
+    cropRect = keyBandRect(keyLocations, advancedOptions)
+    with openFrameSource(videoPath, advancedOptions.decodeBackend, cropRect) as video:
+        startFrame, endFrame = 0, video.numFrames
+        if advancedOptions.autoTrim:
+            with profiler.stage("autoTrim"):
+                startFrame, endFrame = findPerformanceRange(
+                    video, keySampler, sampledKeys
+                )
+    totalFrames = endFrame - startFrame
+    if progress:
+        progress.totalFrames = totalFrames
+
+    # Use a few chunks per worker so uneven decode speed balances out
+    numWorkers = max(advancedOptions.numWorkers, 1)
+    numChunks = max(min(numWorkers * 4, totalFrames // (chunkOverlap * 4)), 1)
+    chunkBounds = np.linspace(startFrame, endFrame, numChunks + 1).astype(int)
+    seekFrames = []
+    chunkLengths = []
+    for i in range(numChunks):
+        # The first chunk starts exactly at the trimmed start, the others
+        # overlap their predecessor so they can be aligned
+        seekFrame = chunkBounds[i] if i == 0 else max(chunkBounds[i] - chunkOverlap, 0)
+        seekFrames.append(int(seekFrame))
+        # The last chunk reads to the end in case the frame count was short,
+        # unless the outro was trimmed
+        if i == numChunks - 1:
+            chunkLengths.append(
+                int(endFrame - seekFrame) if advancedOptions.autoTrim else None
+            )
+        else:
+            chunkLengths.append(int(chunkBounds[i + 1] + chunkOverlap - seekFrame))
+
+    results = [None] * numChunks
+    with profiler.stage("parallelScan", frames=totalFrames):
+        # Workers poll the manager's event, since a plain multiprocessing
+        # event cannot be passed to pool tasks
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+            max_workers=numWorkers
+        ) as executor:
+            stopEvent = manager.Event()
+            futures = {
+                executor.submit(
+                    scanChunk,
+                    videoPath,
+                    keySampler,
+                    seekFrames[i],
+                    chunkLengths[i],
+                    advancedOptions.decodeBackend,
+                    cropRect,
+                    stopEvent,
+                ): i
+                for i in range(numChunks)
+            }
+            pending = set(futures)
+            try:
+                while pending:
+                    # Wake up regularly so cancelling does not wait for a chunk
+                    done, pending = wait(
+                        pending, timeout=0.1, return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        i = futures[future]
+                        results[i] = future.result()
+                        if progress:
+                            progress.advance(int(chunkBounds[i + 1] - chunkBounds[i]))
+                    if progress:
+                        progress.checkCancelled()
+            except TranscriptionCancelled:
+                # Chunks that have not started yet are dropped straight away and
+                # running ones stop at their next poll. Leaving the block waits
+                # for them, so the manager outlives every use of the event.
+                stopEvent.set()
+                for future in pending:
+                    future.cancel()
+                raise
+
+    # Stitch chunks in order, dropping frames already covered by the previous one
+    stitched = []
+    previous, previousStart = None, 0
+    stitchedStart = stitchedEnd = results[0][0]
+    for reportedStart, chunk in results:
+        if previous is None:
+            chunkStart = reportedStart
+        else:
+            chunkStart = alignChunkStart(
+                previous, previousStart, chunk, reportedStart, chunkOverlap
+            )
+        if chunkStart > stitchedEnd:
             logger.sendLog(
-                "Number of detected keys is not equal to expected number of keys based on starting key, this may cause errors in transcription.",
-                LogLevel.WARNING,
+                f"Seeking skipped {chunkStart - stitchedEnd} frames near frame {stitchedEnd}.",
+                LogLevel.WARN,
+                key="seekSkippedFrames",
             )
-        row = {
-            key.name: frame[y][x] for (x, y), key in zip(keyLocations, pianoKeyRange)
-        }
-        data.append(row)
-    df = pd.DataFrame(data)
+        stitched.append(chunk[max(stitchedEnd - chunkStart, 0) :])
+        stitchedEnd = max(stitchedEnd, chunkStart + len(chunk))
+        if len(chunk):
+            previous, previousStart = chunk, chunkStart
+
+    samples, repeats = np.concatenate(stitched), None
+    tolerance = staticTolerance(advancedOptions)
+    if tolerance is not None:
+        with profiler.stage("collapseStaticFrames", frames=len(samples)):
+            samples, repeats = collapseStaticFrames(samples, tolerance)
+    keySamples = KeySamples(samples, sampledKeys, repeats, stitchedStart)
     if debug:
-        df.to_csv("keys.csv", index=True)
-    return df
+        saveKeySamplesCsv(keySamples, "keys.csv")
+    return keySamples
 
 
-def determineKeyPressesGMM(keyData: pd.DataFrame, debug: bool = False) -> pd.DataFrame:
-    # Flatten hsv values
-    hsvFlattened = np.vstack(keyData.values.flatten()).astype(float)
+def decodeKeySamples(
+    videoPath: str,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+) -> KeySamples:
+    if advancedOptions.numWorkers > 1:
+        return readKeysParallel(
+            videoPath, keyLocations, advancedOptions, debug=debug, progress=progress
+        )
+    with openFrameSource(
+        videoPath,
+        advancedOptions.decodeBackend,
+        keyBandRect(keyLocations, advancedOptions),
+    ) as video:
+        if progress:
+            progress.totalFrames = video.numFrames
+        return readKeys(video, keyLocations, advancedOptions, debug, progress)
+
+
+def scanVideo(
+    videoPath: str,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+    keyCache: KeyCache | None = None,
+) -> KeySamples:
+    if not advancedOptions.useKeyCache:
+        return decodeKeySamples(
+            videoPath, keyLocations, advancedOptions, debug, progress
+        )
+    keyCache = keyCache or KeyCache()
+    cacheKey = keySamplesCacheKey(videoPath, keyLocations, advancedOptions)
+    with profiler.stage("cacheLoad"):
+        keySamples = keyCache.load(cacheKey)
+    if keySamples is not None:
+        logger.sendLog("Loaded sampled keys from cache.", LogLevel.INFO)
+        if progress:
+            progress.totalFrames = keySamples.numFrames
+            progress.advance(keySamples.numFrames)
+        return keySamples
+    keySamples = decodeKeySamples(
+        videoPath, keyLocations, advancedOptions, debug, progress
+    )
+    with profiler.stage("cacheStore", arrayBytes=keySamples.samples.nbytes):
+        keyCache.store(cacheKey, keySamples)
+    return keySamples
+
+
+def saveKeySamplesCsv(keySamples: KeySamples, path: str):
+    import pandas as pd
+
+    columns = [
+        f"{keyName}_{channel}" for keyName in keySamples.keyNames for channel in "HSV"
+    ]
+    df = pd.DataFrame(
+        keySamples.frameSamples.reshape(keySamples.numFrames, -1),
+        index=pd.RangeIndex(
+            keySamples.startFrame, keySamples.startFrame + keySamples.numFrames
+        ),
+        columns=columns,
+    )
+    df.to_csv(path, index=True)
+
+
+# Label code of every Notation value, as produced by the lookup table
+notationCodes = {notation.value: code for code, notation in enumerate(Notation)}
+darkValueThreshold = 50
+# A saved color model is reused while at most maxProfileOutlierFraction of a
+# video's samples are rarer than the rarest outlierQuantile of its fit samples
+outlierQuantile = 0.001
+maxProfileOutlierFraction = 0.01
+
+
+@dataclass
+class ColorModel:
+    gmm: "GaussianMixture"
+    # Maps each GMM component to the Notation value it represents
+    labelMap: dict[int, str]
+    # Notation code for every GMM component
+    componentCodes: np.ndarray
+    # Notation code for every quantized (H, S, V) cell, -1 until first seen
+    lut: np.ndarray
+    lutStep: int
+    outlierLogLikelihood: float
+
+
+def componentNotationCodes(
+    gmm: "GaussianMixture", labelMap: dict[int, str]
+) -> np.ndarray:
+    # Components without a hand assignment are treated as unpressed
+    componentCodes = np.full(
+        gmm.n_components, notationCodes[Notation.Unpressed.value], dtype=np.int8
+    )
+    for component, notation in labelMap.items():
+        componentCodes[component] = notationCodes[notation]
+    return componentCodes
+
+
+def emptyLookupTable(lutStep: int) -> np.ndarray:
+    return np.full(
+        (-(-180 // lutStep), -(-256 // lutStep), -(-256 // lutStep)),
+        -1,
+        dtype=np.int8,
+    )
+
+
+def classifyHsv(colorModel: ColorModel, samples: np.ndarray) -> np.ndarray:
+    step = colorModel.lutStep
+    # Dark pixels are classified as one color, matching the fit-time threshold
+    dark = samples[..., 2] < darkValueThreshold
+    cells = (
+        np.where(dark, 0, samples[..., 0] // step),
+        np.where(dark, 0, samples[..., 1] // step),
+        np.where(dark, (darkValueThreshold // 2) // step, samples[..., 2] // step),
+    )
+    flatCells = np.ravel_multi_index(cells, colorModel.lut.shape)
+    flatLut = colorModel.lut.reshape(-1)
+    codes = flatLut[flatCells]
+    # Cells seen for the first time are classified once and remembered, so the
+    # GMM is only evaluated for new colors
+    unknown = codes < 0
+    if unknown.any():
+        newCells = np.unique(flatCells[unknown])
+        cellCenters = (
+            np.stack(np.unravel_index(newCells, colorModel.lut.shape), axis=1) * step
+            + (step - 1) / 2
+        )
+        flatLut[newCells] = colorModel.componentCodes[
+            colorModel.gmm.predict(cellCenters)
+        ]
+        codes[unknown] = flatLut[flatCells[unknown]]
+    return codes
+
+
+def compressHsv(
+    samples: np.ndarray, repeats: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Collapse samples to their distinct colors, since most frames repeat
+    hsv = samples.reshape(-1, 3)
+    packed = (
+        (hsv[:, 0].astype(np.uint32) << 16)
+        | (hsv[:, 1].astype(np.uint32) << 8)
+        | hsv[:, 2]
+    )
     # Threshold out dark pixels (S and H because too noisy at low V)
-    darkValueThreshold = 50
-    darkMask = hsvFlattened[:, 2] < darkValueThreshold
-    hsvFlattened[darkMask] = np.array([0, 0, darkValueThreshold / 2])
+    packed[hsv[:, 2] < darkValueThreshold] = darkValueThreshold // 2
+    uniquePacked, inverse, counts = np.unique(
+        packed, return_inverse=True, return_counts=True
+    )
+    uniqueColors = np.stack(
+        [(uniquePacked >> 16) & 0xFF, (uniquePacked >> 8) & 0xFF, uniquePacked & 0xFF],
+        axis=1,
+    ).astype(float)
+    inverse = inverse.reshape(-1)
+    if repeats is not None:
+        # Count collapsed static frames as often as they were shown
+        counts = np.bincount(
+            inverse,
+            weights=np.repeat(repeats, samples.shape[1]),
+            minlength=len(uniqueColors),
+        ).astype(np.int64)
+    return uniqueColors, inverse, counts
+
+
+def fitMixtureCandidate(
+    samples: np.ndarray, numComponents: int, covarianceType: str, seed: int
+) -> tuple["GaussianMixture", float]:
+    from sklearn.mixture import GaussianMixture
 
-    # Use gaussian mixture model to cluster keys
-    numGroups = 4  # 4 groups: black keys, white keys, left hand color, right hand color
     gmm = GaussianMixture(
-        n_components=numGroups, covariance_type="full", random_state=42
+        n_components=numComponents, covariance_type=covarianceType, random_state=seed
+    )
+    gmm.fit(samples)
+    return gmm, gmm.bic(samples)
+
+
+def selectColorMixture(
+    fitSamples: np.ndarray,
+    numWorkers: int = 1,
+    componentCounts: range = range(3, 9),
+    covarianceTypes: tuple[str, ...] = ("full", "diag"),
+    seeds: tuple[int, ...] = (42, 7),
+    minBicGainPerSample: float = 0.05,
+    patience: int = 2,
+    progress: ScanProgress | None = None,
+) -> "GaussianMixture":
+    # Samples are whole numbers, so spread each over its quantization cell.
+    # Otherwise components collapsing onto single colors get unbounded
+    # likelihoods and BIC keeps rewarding more of them.
+    rng = np.random.default_rng(42)
+    samples = fitSamples + rng.uniform(-0.5, 0.5, fitSamples.shape)
+    candidates = [
+        (numComponents, covarianceType, seed)
+        for numComponents in componentCounts
+        for covarianceType in covarianceTypes
+        for seed in seeds
+    ]
+    minBicGain = minBicGainPerSample * len(samples)
+    bestGmm, bestBic = None, np.inf
+    countsWithoutGain = 0
+    executor = ProcessPoolExecutor(max_workers=numWorkers) if numWorkers > 1 else None
+    try:
+        # Every candidate is queued up front so idle workers start on larger
+        # component counts while smaller ones are still being scored
+        if executor:
+            futures = [
+                executor.submit(fitMixtureCandidate, samples, *candidate)
+                for candidate in candidates
+            ]
+            results = (future.result() for future in futures)
+        else:
+            results = (
+                fitMixtureCandidate(samples, *candidate) for candidate in candidates
+            )
+        for numComponents in componentCounts:
+            countResults = []
+            for _ in range(len(covarianceTypes) * len(seeds)):
+                if progress:
+                    progress.checkCancelled()
+                countResults.append(next(results))
+            countGmm, countBic = min(countResults, key=lambda result: result[1])
+            logger.sendLog(
+                f"Color model with {numComponents} components "
+                f"({countGmm.covariance_type}): BIC {countBic:.0f}.",
+                LogLevel.DEBUG,
+            )
+            if countBic <= bestBic - minBicGain:
+                bestGmm, bestBic = countGmm, countBic
+                countsWithoutGain = 0
+                continue
+            # EM can land in a poor optimum for one count, so only stop once
+            # several further components in a row do not pay for themselves
+            countsWithoutGain += 1
+            if countsWithoutGain >= patience:
+                break
+    finally:
+        # Queued fits are dropped, but the running ones are waited for: a pool
+        # left behind keeps a worker process (like the CLI's) from exiting
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+    logger.sendLog(
+        f"Selected a color model with {bestGmm.n_components} components "
+        f"({bestGmm.covariance_type} covariance).",
+        LogLevel.INFO,
     )
-    gmm.fit(hsvFlattened)
-    labels = gmm.predict(hsvFlattened)
+    return bestGmm
+
+
+def fitColorModel(
+    keyData: KeySamples,
+    debug: bool = False,
+    maxFitSamples: int = 20000,
+    lutStep: int = 1,
+    numComponents: int = 4,
+    numWorkers: int = 1,
+    progress: ScanProgress | None = None,
+) -> ColorModel:
+    with profiler.stage("compressColors", frames=keyData.numFrames):
+        uniqueColors, inverse, counts = compressHsv(keyData.samples, keyData.repeats)
+    # Fit on a count-weighted subsample of the distinct colors so fit time
+    # depends on the palette rather than on video length
+    if counts.sum() <= maxFitSamples:
+        fitSamples = np.repeat(uniqueColors, counts, axis=0)
+    else:
+        rng = np.random.default_rng(42)
+        fitIndices = rng.choice(
+            len(uniqueColors), maxFitSamples, p=counts / counts.sum()
+        )
+        fitSamples = uniqueColors[fitIndices]
+
+    from sklearn.mixture import GaussianMixture
+
+    # Use gaussian mixture model to cluster keys, by default with 4 groups:
+    # black keys, white keys, left hand color, right hand color
+    if numComponents > 0:
+        gmm = GaussianMixture(
+            n_components=numComponents, covariance_type="full", random_state=42
+        )
+        with profiler.stage("gmmFit", arrayBytes=fitSamples.nbytes):
+            gmm.fit(fitSamples)
+    else:
+        with profiler.stage("gmmSelection", arrayBytes=fitSamples.nbytes):
+            gmm = selectColorMixture(fitSamples, numWorkers, progress=progress)
+    if progress:
+        progress.checkCancelled()
+    # Predict each distinct color once and spread the labels back over the grid
+    with profiler.stage("gmmPredict", arrayBytes=uniqueColors.nbytes):
+        labels = gmm.predict(uniqueColors)[inverse]
+        outlierLogLikelihood = weightedQuantile(
+            gmm.score_samples(uniqueColors), counts, outlierQuantile
+        )
     centers = gmm.means_
 
     if debug:
+        from matplotlib import pyplot as plt
+
+        hsvFlattened = uniqueColors[inverse]
         # --------------------------
         # Convert HSV → RGB for plotting
         # --------------------------
@@ -159,58 +1119,500 @@ def determineKeyPressesGMM(keyData: pd.DataFrame, debug: bool = False) -> pd.Dat
         ax.legend()
         plt.show()
 
-    # Turn labels into dataframe
-    originalShape = keyData.shape
-    labelMatrix = labels.reshape(originalShape)
-    labeledDf = pd.DataFrame(labelMatrix, index=keyData.index, columns=keyData.columns)
+    with profiler.stage("handAssignment"):
+        labelMap = assignHandLabels(
+            labels.reshape(keyData.samples.shape[:2]),
+            gmm.n_components,
+            keyData.keys,
+            gmm.means_,
+            keyData.repeats,
+        )
+    return ColorModel(
+        gmm,
+        labelMap,
+        componentNotationCodes(gmm, labelMap),
+        emptyLookupTable(lutStep),
+        lutStep,
+        outlierLogLikelihood,
+    )
+
+
+def weightedQuantile(values: np.ndarray, weights: np.ndarray, quantile: float) -> float:
+    order = np.argsort(values)
+    cumulativeWeights = np.cumsum(weights[order])
+    index = np.searchsorted(cumulativeWeights, quantile * cumulativeWeights[-1])
+    return float(values[order[index]])
+
+
+def fullCovariances(gmm: "GaussianMixture") -> np.ndarray:
+    # Profiles always store full matrices, which represent every covariance type
+    if gmm.covariance_type == "diag":
+        return gmm.covariances_[:, :, None] * np.eye(gmm.means_.shape[1])
+    return gmm.covariances_
+
+
+def colorModelToProfile(colorModel: ColorModel) -> ColorProfile:
+    return ColorProfile(
+        colorModel.gmm.weights_,
+        colorModel.gmm.means_,
+        fullCovariances(colorModel.gmm),
+        colorModel.labelMap,
+        colorModel.outlierLogLikelihood,
+    )
+
+
+def colorModelFromProfile(profile: ColorProfile, lutStep: int = 1) -> ColorModel:
+    from sklearn.mixture import GaussianMixture
+
+    # Restore a fitted mixture from its parameters instead of refitting it
+    gmm = GaussianMixture(
+        n_components=len(profile.weights), covariance_type="full", random_state=42
+    )
+    gmm.weights_ = profile.weights
+    gmm.means_ = profile.means
+    gmm.covariances_ = profile.covariances
+    gmm.precisions_cholesky_ = np.linalg.inv(
+        np.linalg.cholesky(profile.covariances)
+    ).transpose(0, 2, 1)
+    gmm.precisions_ = gmm.precisions_cholesky_ @ gmm.precisions_cholesky_.transpose(
+        0, 2, 1
+    )
+    gmm.converged_ = True
+    gmm.n_iter_ = 0
+    gmm.lower_bound_ = -np.inf
+    gmm.n_features_in_ = profile.means.shape[1]
+    return ColorModel(
+        gmm,
+        profile.labelMap,
+        componentNotationCodes(gmm, profile.labelMap),
+        emptyLookupTable(lutStep),
+        lutStep,
+        profile.outlierLogLikelihood,
+    )
+
+
+def colorOutlierFraction(
+    colorModel: ColorModel, keyData: KeySamples, maxFrames: int = 2000
+) -> float:
+    # Only a strided subset of frames is checked, which is enough to notice a
+    # different theme without paying for a full pass over long videos
+    frameStep = max(len(keyData.samples) // maxFrames, 1)
+    uniqueColors, _, counts = compressHsv(
+        keyData.samples[::frameStep],
+        None if keyData.repeats is None else keyData.repeats[::frameStep],
+    )
+    logLikelihoods = colorModel.gmm.score_samples(uniqueColors)
+    outliers = logLikelihoods < colorModel.outlierLogLikelihood
+    return float(counts[outliers].sum() / counts.sum())
 
-    # Determine which groups are left hand and right hand
+
+def loadColorModel(profilePath: str, keyData: KeySamples) -> ColorModel | None:
+    # Returns the saved model only if it still explains this video's colors
+    profile = loadColorProfile(profilePath)
+    if profile is None:
+        return None
+    colorModel = colorModelFromProfile(profile)
+    with profiler.stage("colorProfileCheck", frames=keyData.numFrames):
+        outlierFraction = colorOutlierFraction(colorModel, keyData)
+    if outlierFraction > maxProfileOutlierFraction:
+        logger.sendLog(
+            f"Colors differ from color profile {profilePath} "
+            f"({outlierFraction:.1%} unexpected samples), refitting.",
+            LogLevel.WARN,
+        )
+        return None
+    logger.sendLog(f"Reusing color profile {profilePath}.", LogLevel.INFO)
+    return colorModel
+
+
+def resolveColorModel(
+    keyData: KeySamples,
+    advancedOptions: AdvancedOptions,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+) -> ColorModel:
+    fitOptions = {
+        "numComponents": advancedOptions.colorComponents,
+        "numWorkers": advancedOptions.numWorkers,
+        "progress": progress,
+    }
+    if not advancedOptions.colorProfile:
+        return fitColorModel(keyData, debug, **fitOptions)
+    profilePath = colorProfilePath(advancedOptions.colorProfile)
+    colorModel = loadColorModel(profilePath, keyData)
+    if colorModel is not None:
+        return colorModel
+    colorModel = fitColorModel(keyData, debug, **fitOptions)
+    saveNewColorProfile(profilePath, colorModel)
+    return colorModel
+
+
+def saveNewColorProfile(profilePath: str, colorModel: ColorModel):
+    # A profile that no longer matches is kept, since other videos may still
+    # use its colors
+    if os.path.exists(profilePath):
+        return
+    saveColorProfile(profilePath, colorModelToProfile(colorModel))
+    logger.sendLog(f"Saved color profile {profilePath}.", LogLevel.INFO)
+
+
+# Linear sRGB to CIE XYZ, with each row scaled by the D65 white point
+srgbToXyz = np.array(
+    [
+        [0.4124, 0.3576, 0.1805],
+        [0.2126, 0.7152, 0.0722],
+        [0.0193, 0.1192, 0.9505],
+    ]
+) / np.array([[0.9505], [1.0], [1.089]])
+
+
+def hsvToLab(hsvColors: np.ndarray) -> np.ndarray:
+    # CIELAB distances follow perceived color differences, unlike HSV where hue
+    # is meaningless for the unsaturated colors of white and black keys. Only a
+    # few colors are converted, so this is done directly instead of through
+    # OpenCV, whose first float Lab conversion spends ~0.3s building tables.
+    hsvUint8 = np.clip(np.rint(hsvColors), 0, [179, 255, 255]).astype(np.uint8)
+    bgr = cv2.cvtColor(hsvUint8.reshape(-1, 1, 3), cv2.COLOR_HSV2BGR).reshape(-1, 3)
+    rgb = bgr[:, ::-1] / 255
+    linearRgb = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linearRgb @ srgbToXyz.T
+    delta = 6 / 29
+    f = np.where(xyz > delta**3, np.cbrt(xyz), xyz / (3 * delta**2) + 4 / 29)
+    return np.stack(
+        [116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])],
+        axis=1,
+    )
+
+
+def assignHandLabels(
+    labelMatrix: np.ndarray,
+    numComponents: int,
+    keys: list[PianoKey],
+    componentColors: np.ndarray,
+    rowRepeats: np.ndarray | None = None,
+    minHandColorDistance: float = 20,
+) -> dict[int, str]:
+    # Count every (label, key) pair at once, shape (components, keys)
+    numKeys = labelMatrix.shape[1]
+    keyIndices = np.arange(numKeys)
+    labelKeyCounts = np.bincount(
+        (labelMatrix * numKeys + keyIndices).reshape(-1),
+        weights=None if rowRepeats is None else np.repeat(rowRepeats, numKeys),
+        minlength=numComponents * numKeys,
+    ).reshape(numComponents, numKeys)
+    labelFrequency = labelKeyCounts.sum(axis=1)
 
     # The two most frequent labels should belong to unpressed keys
-    uniqueLabels, counts = np.unique(labels, return_counts=True)
-    labelFrequencyMap = {}
-    for label, count in zip(uniqueLabels, counts):
-        labelFrequencyMap[label] = count
-    unpressedKeyLabels = sorted(
-        labelFrequencyMap, key=labelFrequencyMap.get, reverse=True
-    )[:2]
-    pressedKeyLabels = sorted(
-        labelFrequencyMap, key=labelFrequencyMap.get, reverse=True
-    )[2:]
-    # Determine the average location of each played label to determine whether it is L/R hand
-    averageLabelLocation = {}
-    for label in pressedKeyLabels:
-        for key in PianoKey:
-            mask = (labeledDf[key.name] == label).astype(int)
-            averageLabelLocation[label] = (
-                mask.sum(axis=0) * key.value
-            ) + averageLabelLocation.get(label, 0)
-        averageLabelLocation[label] = (
-            averageLabelLocation[label] / labelFrequencyMap[label]
+    presentLabels = np.flatnonzero(labelFrequency)
+    byFrequency = presentLabels[
+        np.argsort(-labelFrequency[presentLabels], kind="stable")
+    ]
+    unpressedKeyLabels = byFrequency[:2]
+    otherLabels = byFrequency[2:]
+    # Extra components may model shades of the unpressed keys instead of a
+    # hand, so only colors clearly different from both count as pressed
+    labColors = hsvToLab(componentColors)
+    colorDistances = np.linalg.norm(labColors[:, None] - labColors[None], axis=2)
+    isHandColor = (
+        colorDistances[np.ix_(otherLabels, unpressedKeyLabels)].min(
+            axis=1, initial=np.inf
         )
+        >= minHandColorDistance
+    )
+    pressedKeyLabels = otherLabels[isHandColor]
+
     # Create a map to change labels from numeric to hand notation
-    labelMap = {}
-    for unpressedKeyLabel in unpressedKeyLabels:
-        labelMap[unpressedKeyLabel] = Notation.Unpressed.value
-    leftHandLabel = min(averageLabelLocation, key=averageLabelLocation.get)
-    rightHandLabel = max(averageLabelLocation, key=averageLabelLocation.get)
-    labelMap[leftHandLabel] = Notation.LeftHand.value
-    labelMap[rightHandLabel] = Notation.RightHand.value
-    labeledDf = labeledDf.replace(labelMap)
+    labelMap = {
+        int(label): Notation.Unpressed.value
+        for label in np.concatenate([unpressedKeyLabels, otherLabels[~isHandColor]])
+    }
+    if not len(pressedKeyLabels):
+        return labelMap
+
+    # The average key of each pressed label determines whether it is L/R hand
+    keyValues = np.array([key.value for key in keys], dtype=float)
+    averageLabelLocation = (
+        labelKeyCounts[pressedKeyLabels] @ keyValues
+    ) / labelFrequency[pressedKeyLabels]
+    leftHandLabel = pressedKeyLabels[np.argmin(averageLabelLocation)]
+    rightHandLabel = pressedKeyLabels[np.argmax(averageLabelLocation)]
+    if leftHandLabel == rightHandLabel:
+        # A single hand color, as in one-handed pieces, goes by its side of middle C
+        hand = (
+            Notation.LeftHand
+            if averageLabelLocation[0] < PianoKey.C4.value
+            else Notation.RightHand
+        )
+        labelMap[int(leftHandLabel)] = hand.value
+        return labelMap
+    # Any further pressed colors belong to the hand whose color they are closest to
+    for label in pressedKeyLabels:
+        closerToLeft = (
+            colorDistances[label, leftHandLabel]
+            <= colorDistances[label, rightHandLabel]
+        )
+        labelMap[int(label)] = (
+            Notation.LeftHand.value if closerToLeft else Notation.RightHand.value
+        )
+    return labelMap
+
+
+def labelKeySamples(colorModel: ColorModel, keyData: KeySamples) -> KeyLabels:
+    with profiler.stage(
+        "classify", frames=keyData.numFrames, arrayBytes=keyData.samples.nbytes
+    ):
+        codes = classifyHsv(colorModel, keyData.samples)
+    if keyData.repeats is not None:
+        # Collapsed static frames share the label of the row they repeat
+        codes = np.repeat(codes, keyData.repeats, axis=0)
+    return KeyLabels(codes, keyData.keys, keyData.startFrame)
+
+
+def determineKeyPressesGMM(
+    keyData: KeySamples,
+    debug: bool = False,
+    advancedOptions: AdvancedOptions | None = None,
+    progress: ScanProgress | None = None,
+) -> KeyLabels:
+    colorModel = resolveColorModel(
+        keyData, advancedOptions or AdvancedOptions(), debug, progress
+    )
+    keyLabels = labelKeySamples(colorModel, keyData)
 
     if debug:
-        labeledDf.to_csv("labeledKeys.csv", index=True)
+        saveKeyTimeline(encodeKeyTimeline(keyLabels), "labeledKeys.sktl")
 
-    return labeledDf
+    return keyLabels
 
 
-def transcribeVideo():
-    pass
+class FrameReservoir:
+    # Uniform random sample of a bounded number of frames from a stream (Algorithm R)
+    def __init__(self, capacity: int, numKeys: int, seed: int = 42):
+        self.capacity = capacity
+        self.frames = np.empty((capacity, numKeys, 3), dtype=np.uint8)
+        self.numSeen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, batch: np.ndarray):
+        # Fill any free slots directly
+        numFree = max(min(self.capacity - self.numSeen, len(batch)), 0)
+        self.frames[self.numSeen : self.numSeen + numFree] = batch[:numFree]
+        # Later frames replace a random slot with decreasing probability
+        remaining = batch[numFree:]
+        if len(remaining):
+            seenIndices = self.numSeen + numFree + np.arange(len(remaining))
+            slots = self.rng.integers(0, seenIndices + 1)
+            keep = slots < self.capacity
+            self.frames[slots[keep]] = remaining[keep]
+        self.numSeen += len(batch)
+
+    @property
+    def samples(self) -> np.ndarray:
+        return self.frames[: min(self.numSeen, self.capacity)]
+
+
+def iterKeySampleBatches(
+    video: FrameSource,
+    keySampler: KeySampler,
+    batchSize: int,
+    maxFrames: int | None = None,
+    progress: ScanProgress | None = None,
+    staticTolerance: int | None = None,
+) -> Iterator[tuple[np.ndarray, np.ndarray | None]]:
+    # Yields (samples, repeats) for up to batchSize frames at a time
+    numFrames = 0
+    while maxFrames is None or numFrames < maxFrames:
+        if maxFrames is not None:
+            batchSize = min(batchSize, maxFrames - numFrames)
+        batch, repeats = sampleFrames(
+            video, keySampler, batchSize, progress, staticTolerance=staticTolerance
+        )
+        if not len(batch):
+            return
+        numFrames += len(batch) if repeats is None else int(repeats.sum())
+        yield batch, repeats
+
+
+def streamKeyPresses(
+    video: FrameSource,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    batchSize: int = 512,
+    warmupFrames: int = 3600,
+    reservoirFrames: int = 1024,
+    progress: ScanProgress | None = None,
+) -> Iterator[KeyLabels]:
+    # Memory is bounded by the warmup window: batches are held only until the
+    # model has been fitted, after which every batch is labeled as it arrives
+    sampledKeys, keySampler = prepareKeySampling(keyLocations, advancedOptions)
+    startFrame, numFrames = 0, None
+    if advancedOptions.autoTrim:
+        startFrame, numFrames = seekPerformanceRange(
+            video, keySampler, sampledKeys, progress
+        )
+    reservoir = FrameReservoir(reservoirFrames, len(sampledKeys))
+    pendingBatches: list[KeySamples] = []
+    colorModel = None
+    profilePath = (
+        colorProfilePath(advancedOptions.colorProfile)
+        if advancedOptions.colorProfile
+        else None
+    )
+
+    def fitReservoir() -> ColorModel:
+        colorModel = fitColorModel(
+            KeySamples(reservoir.samples, sampledKeys),
+            numComponents=advancedOptions.colorComponents,
+            numWorkers=advancedOptions.numWorkers,
+            progress=progress,
+        )
+        if profilePath:
+            saveNewColorProfile(profilePath, colorModel)
+        return colorModel
+
+    for batch, repeats in iterKeySampleBatches(
+        video,
+        keySampler,
+        batchSize,
+        numFrames,
+        progress,
+        staticTolerance(advancedOptions),
+    ):
+        batchSamples = KeySamples(batch, sampledKeys, repeats, startFrame)
+        startFrame += batchSamples.numFrames
+        pendingBatches.append(batchSamples)
+        # A saved profile matching the first batch makes the warmup unnecessary
+        if colorModel is None and profilePath and reservoir.numSeen == 0:
+            colorModel = loadColorModel(profilePath, batchSamples)
+        if colorModel is None:
+            # The reservoir samples frames, so collapsed rows count as often
+            # as they were shown
+            reservoir.add(batchSamples.frameSamples)
+            if reservoir.numSeen < warmupFrames:
+                continue
+            colorModel = fitReservoir()
+        for pendingSamples in pendingBatches:
+            yield labelKeySamples(colorModel, pendingSamples)
+        pendingBatches = []
+    # Videos shorter than the warmup window are fitted on everything they had
+    if pendingBatches:
+        colorModel = fitReservoir()
+        for pendingSamples in pendingBatches:
+            yield labelKeySamples(colorModel, pendingSamples)
+
+
+def streamKeyTimeline(
+    videoPath: str,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+) -> KeyTimeline:
+    # Labels are folded into key runs batch by batch, so neither the samples
+    # nor the labels of the whole video are ever held in memory
+    timelineBuilder = KeyTimelineBuilder()
+    with openFrameSource(
+        videoPath,
+        advancedOptions.decodeBackend,
+        keyBandRect(keyLocations, advancedOptions),
+    ) as video:
+        if progress:
+            progress.totalFrames = video.numFrames
+        for keyLabels in streamKeyPresses(
+            video, keyLocations, advancedOptions, progress=progress
+        ):
+            with profiler.stage("timelineEncode", frames=keyLabels.numFrames):
+                timelineBuilder.add(keyLabels)
+    keyTimeline = timelineBuilder.finish()
+    if debug:
+        saveKeyTimeline(keyTimeline, "labeledKeys.sktl")
+    return keyTimeline
+
+
+def runTranscription(
+    videoPath: str,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    outputPath: str,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+    keyCache: KeyCache | None = None,
+) -> list[HandNotes]:
+    video = cv2.VideoCapture(videoPath)
+    fps = video.get(cv2.CAP_PROP_FPS)
+    video.release()
+    if advancedOptions.streamTranscription:
+        keyTimeline = streamKeyTimeline(
+            videoPath, keyLocations, advancedOptions, debug, progress
+        )
+    else:
+        keySamples = scanVideo(
+            videoPath, keyLocations, advancedOptions, debug, progress, keyCache
+        )
+        keyLabels = determineKeyPressesGMM(keySamples, debug, advancedOptions, progress)
+        with profiler.stage("timelineEncode", frames=keyLabels.numFrames):
+            keyTimeline = encodeKeyTimeline(keyLabels)
+    if progress:
+        progress.checkCancelled()
+    # Every pressed run of the key timeline is one note
+    with profiler.stage("noteExtraction", frames=keyTimeline.numFrames):
+        hands = activeNotes(keyTimeline, fps)
+    with profiler.stage("midiExport"):
+        writeMidiFile(outputPath, hands)
+    for handNotes in hands:
+        logger.sendLog(
+            f"Transcribed {handNotes.numNotes} {handNotes.hand.name} notes.",
+            LogLevel.INFO,
+        )
+    return hands
+
+
+def transcribeVideo(
+    videoPath: str,
+    keyLocations: list[tuple[int, int]],
+    advancedOptions: AdvancedOptions,
+    outputPath: str,
+    debug: bool = False,
+    progress: ScanProgress | None = None,
+    keyCache: KeyCache | None = None,
+) -> list[HandNotes]:
+    profiler.reset()
+    start = time.perf_counter()
+    if advancedOptions.profileRun:
+        with profiledRun(os.path.splitext(outputPath)[0] + ".profile"):
+            hands = runTranscription(
+                videoPath,
+                keyLocations,
+                advancedOptions,
+                outputPath,
+                debug,
+                progress,
+                keyCache,
+            )
+    else:
+        hands = runTranscription(
+            videoPath,
+            keyLocations,
+            advancedOptions,
+            outputPath,
+            debug,
+            progress,
+            keyCache,
+        )
+    if advancedOptions.writeTimings:
+        writeTimingsReport(
+            os.path.splitext(outputPath)[0] + ".timings.json",
+            time.perf_counter() - start,
+        )
+    logger.sendLog(profiler.summary(), LogLevel.INFO)
+    logger.flushSuppressed(force=True)
+    return hands
 
 
 # Just for local debugging
 def main():
-    videoCapture = cv2.VideoCapture("./Hercules -.mp4")
+    videoPath = "./Hercules -.mp4"
+    videoCapture = cv2.VideoCapture(videoPath)
     if not videoCapture.isOpened():
         print("Error: Unable to open video file.")
         return
@@ -219,11 +1621,10 @@ def main():
     if not ret:
         print("Error: Unable to read frame.")
         return
+    videoCapture.release()
     advancedOptions = AdvancedOptions()
     keyLocations = determineKeyLocations(frame, advancedOptions)
-    df = readKeys(videoCapture, keyLocations, advancedOptions, True)
-    keyPressDf, centers = determineKeyPressesGMM(df, True)
-    videoCapture.release()
+    transcribeVideo(videoPath, keyLocations, advancedOptions, "transcription.mid", True)
     cv2.destroyAllWindows()
 
 